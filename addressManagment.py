@@ -1,12 +1,22 @@
 import commands
 import ctypes.util
+import fibBackend
+import fibClasses
+import fibMirror
+import netlinkMonitor
 import struct
+import time
 
 
 libc = ctypes.CDLL(ctypes.util.find_library('C'))
+fib = fibMirror.FIBMirror()
 
 
 def get_interface_address(intf):
+    if netlinkMonitor.monitor.running():
+        address = netlinkMonitor.monitor.get_link_local(intf)
+        if address is not None:
+            return address
     intf_ip = 'fe80::/64'
     aux = commands.getoutput("ip address show dev "+ intf).split()
     for i in range(aux.index('inet6'),len(aux)):
@@ -32,6 +42,8 @@ def get_interface(intf):
 
 
 def get_int_scopeid(ifName):
+    if netlinkMonitor.monitor.running() and netlinkMonitor.monitor.get_index(ifName) is not None:
+        return netlinkMonitor.monitor.get_index(ifName)
     ip6scopeid = {}
     for line in open("/proc/net/if_inet6"):
         addr, id,_, scope, _, ifacename = line.split()
@@ -41,48 +53,71 @@ def get_int_scopeid(ifName):
     return 0
 
 
-def add_route(route, via, metric, isNextHop):
-    metric = str(metric)
-    aux = commands.getoutput('ip -6 route')
-    aux = aux.split('\n')
-    for line in aux:
-        if route in line:
-            print_service('ip -6 route del ' + route)
-            print_service(commands.getoutput('ip -6 route del ' + route))
-    if isNextHop:
-        print_service(commands.getoutput('ip -6 route add ' + route + ' dev ' + via.intfId + ' metric ' + metric))
-    else:
-        print_service(commands.getoutput(
-            'ip -6 route add ' + route + ' via ' + via.linkLocal + ' dev ' + via.intfId + ' metric ' + metric))
-    print_service('route ' + route + ' via ' + via.intfId + ' added')
-
-
-def update_cost(destination, via, newcost, isnexthop):
-    old = commands.getoutput('ip -6 route show ' + destination)
-    old = old.split(' ')
-    if old != '':
-        try:
-            old = old[:-(len(old)-old.index('metric'))]
-        except:
-            old = old[:-2]
-        old = ' '.join(old)
-        print_service('\nip -6 route del ' + old + ': \n\t- ' + commands.getoutput('ip -6 route del ' + old))
-    if isnexthop:
-        print_service('ip -6 route add ' + destination + ' dev ' + via.intfId + ' metric ' + str(newcost))
-        print_service('\t- ' + commands.getoutput('ip -6 route add ' + destination + ' dev ' + via.intfId + ' metric ' + str(newcost)))
-    else:
-        print_service('ip -6 route add ' + destination + ' via ' + via.linkLocal + ' dev ' + via.intfId + ' metric ' + str(newcost))
-        print_service('\t- ' + commands.getoutput('ip -6 route add ' + destination + ' via ' + via.linkLocal + ' dev ' + via.intfId + ' metric ' + str(newcost)))
-
-
-def del_route(route, via):
-    print_service('ip -6 route del ' + route + ' dev ' + via)
-    print_service(commands.getoutput('ip -6 route del ' + route + ' dev ' + via))
-
-
-def del_route_via(route, dev, via):
-    print_service('ip -6 route del ' + route + ' via ' + via + ' dev ' + dev)
-    print_service(commands.getoutput('ip -6 route del ' + route + ' via ' + via + ' dev ' + dev))
+class FIBOperation:
+    def __init__(self, key, prefix, vias, metric, isNextHop, dev=None, via=None, report=None):
+        self.key = key  # handed back with the result, None when nobody waits for it
+        self.prefix = prefix
+        self.vias = vias  # [Adjacency,], None removes the route
+        self.metric = metric
+        self.isNextHop = isNextHop
+        self.dev = dev  # delete only: restrict to this device / gateway, both None removes the whole route
+        self.via = via
+        self.report = report  # report(key, errno) once the kernel answered
+        self.queued = time.time()
+        self.rank = fibClasses.classify(prefix)  # install class, lower ranks reach the kernel first
+
+    def is_delete(self):
+        return self.vias is None
+
+    def whole_route(self):
+        return self.dev is None and self.via is None
+
+
+class FIBTransaction:  # route changes of one SPF run, written to the kernel at once
+    def __init__(self, report=None):
+        self.operations = []  # [FIBOperation,]
+        self.report = report
+
+    def __len__(self):
+        return len(self.operations)
+
+    def add_route(self, key, prefix, vias, metric, isNextHop):  # replaces whatever the prefix had
+        self.operations.append(FIBOperation(key, prefix, vias, metric, isNextHop, report=self.report))
+
+    def del_route(self, prefix, dev=None, via=None, key=None):
+        self.operations.append(FIBOperation(key, prefix, None, None, None, dev, via, self.report))
+
+    def add_operation(self, operation):
+        self.operations.append(operation)
+
+    def commit(self):  # {key: errno} of every operation carrying a key, 0 when it was applied
+        if len(self.operations) == 0:
+            return {}
+        self.operations.sort(key=lambda operation: operation.rank)  # stable, order within a class is kept
+        selected = fibBackend.get_backend()
+        deleted = [not operation.is_delete() and fibBackend.deletes_first(operation, fib)
+                   for operation in self.operations]  # the mirror as plan() sees it, before any result is applied
+        results = selected.commit(self.operations, fib)
+        print_service(str(len(self.operations)) + ' route operations sent to the ' + selected.name + ' FIB backend')
+        out = {}
+        for operation, result, oldDeleted in zip(self.operations, results, deleted):
+            if operation.is_delete():
+                fib.remove(operation.prefix, operation.dev, operation.via)
+            elif result == 0:
+                fib.set(operation.prefix, operation.vias, operation.metric, operation.isNextHop)
+            elif oldDeleted:  # the old route went away before the new one was refused
+                fib.remove(operation.prefix)
+            if operation.key is not None:
+                out[operation.key] = result
+                if operation.report is not None:
+                    operation.report(operation.key, result)
+        return out
+
+
+def reconcile_fib():
+    added, removed, changed = fib.reconcile(fibBackend.get_backend().dump())
+    print 'FIB reconciled with the ' + fibBackend.get_backend().name + ' backend: ' + str(len(fib)) + ' routes, ' + str(added) + ' unknown, ' + str(
+        removed) + ' missing, ' + str(changed) + ' different'
 
 
 def clear_ip_config(dev, addr):
@@ -90,17 +125,12 @@ def clear_ip_config(dev, addr):
 
 
 def clear_routing():
-    routes = commands.getoutput('ip -6 route')
-    routes = routes.split('\n')
-    for route in routes:
-        if route[0:4] == 'fe80':
-            continue
-        else:
-            print_service(commands.getoutput('ip -6 route del ' + route))
+    fib.clear()
+    fibBackend.get_backend().flush()
 
 
 def show_route():
-    aux = commands.getoutput('ip -6 route show')
+    aux = fibBackend.get_backend().show()
     aux = aux.split('\n')
     routeTable = ''
     for line in aux:
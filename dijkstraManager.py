@@ -2,8 +2,16 @@ from collections import defaultdict
 from copy import deepcopy
 import threading
 import addressManagment
+import fibWriter
+import gracefulRestart
 import linkStateDatabase
 import datetime
+import spfEngine
+import spfScheduler
+import lfaManager
+
+SPF_ENGINES = ['incremental', 'heap', 'legacy']
+spf_engine = 'incremental'
 
 
 class Node:
@@ -47,6 +55,16 @@ class Node:
     def get_prefixes(self):
         pass
 
+    def has_prefix(self, address):
+        prefixes = self.interAreaPrefixes.values()
+        for table in (self.address, self.prefix):
+            if table is not None:
+                prefixes += table.values()
+        for prefix in prefixes:
+            if prefix.address == address:
+                return True
+        return False
+
     def add_neighbor(self, neighbor):
         pass
 
@@ -171,58 +189,138 @@ class NetworkNode(Node):
         print '\n'
 
 
-class Graph:
+class Graph:  # writers replace adjacency tuples, full SPF runs work on a snapshot(), repairs read it unlocked
     def __init__(self):
         self.nodes = set()
-        self.edges = defaultdict(list)  # {SNode: [DNode1, DNode2]}
+        self.edges = defaultdict(tuple)  # {SNode: (DNode1, DNode2)}
+        self.inEdges = {}  # {DNode: frozenset(SNode1, SNode2)}
         self.distances = {}
+        self.trackDeltas = False
+        self.deltas = []  # [(SNode, DNode, oldCost, newCost),] newCost None -> edge removed
+        self.nodesChanged = False
+        self.lock = threading.RLock()
+        self.csr = None  # spfEngine.CSRGraph, only touched by the SPF thread
+        self.version = 0  # bumped on every topology change
+        self.revision = 0  # bumped on every topology or cost change
+        self.costPatches = []  # [(SNode, DNode, cost),] cost-only changes not yet applied to the csr
 
     def add_node(self, node):
-        self.nodes.add(node)
-        self.edges[node] = []
+        self.lock.acquire()
+        try:
+            self.nodes.add(node)
+            for dnode in self.edges.get(node, ()):
+                self.inEdges[dnode] = self.inEdges.get(dnode, frozenset()) - frozenset([node])
+            self.edges[node] = ()
+            self.mark_nodes_changed()
+        finally:
+            self.lock.release()
         return self
 
     def remove_node(self, node):
-        if node in self.edges.keys():
-            for dnode in self.edges[node]:
-                self.remove_edge(node, dnode)
-                addressManagment.print_service('removing edge from ' + str(node.idx) + ' to ' + str(dnode))
-            del self.edges[node]
-            self.nodes.remove(node)
+        self.lock.acquire()
+        try:
+            if node in self.edges.keys():
+                for dnode in self.edges[node]:
+                    self.remove_edge(node, dnode)
+                    addressManagment.print_service('removing edge from ' + str(node.idx) + ' to ' + str(dnode))
+                del self.edges[node]
+                self.nodes.remove(node)
+                self.mark_nodes_changed()
+        finally:
+            self.lock.release()
 
     def add_edge(self, from_node, to_node, distance):
-        if to_node not in self.edges[from_node]:
-            self.edges[from_node].append(to_node)
-        self.distances[(from_node, to_node)] = distance
-        if not from_node.isOverlay:
-            from_node.add_connection()
+        self.lock.acquire()
+        try:
+            if to_node in self.edges.get(from_node, ()) and self.distances.get((from_node, to_node)) == distance:
+                return self  # router LSA refreshes re-add every edge, an unchanged one is no topology change
+            if to_node not in self.edges[from_node]:
+                self.edges[from_node] += (to_node,)
+            self.inEdges[to_node] = self.inEdges.get(to_node, frozenset()) | frozenset([from_node])
+            self.record_delta(from_node, to_node, self.distances.get((from_node, to_node)), distance)
+            self.distances[(from_node, to_node)] = distance
+            if not from_node.isOverlay:
+                from_node.add_connection()
+        finally:
+            self.lock.release()
         return self
 
     def remove_edge(self, from_node, to_node):
+        self.lock.acquire()
         try:
-            self.edges[from_node].remove(to_node)
+            edges = self.edges[from_node]
+            if to_node not in edges:
+                print 'failed to remove edge ' + str(from_node.idx) + '->' + str(to_node) + ' on overlay'
+                return
+            self.edges[from_node] = tuple([edge for edge in edges if edge != to_node])
+            self.inEdges[to_node] = self.inEdges.get(to_node, frozenset()) - frozenset([from_node])
+            self.record_delta(from_node, to_node, self.distances.get((from_node, to_node)), None)
             if not from_node.isOverlay:
                 from_node.remove_connection()
-            del self.distances[(from_node, to_node)]
-        except:
-            try:
-                self.edges[from_node].remove(to_node)
-                del self.distances[(from_node, to_node)]
-            except:
-                print 'failed to remove edge ' + from_node.idx + '->' + to_node + ' on overlay'
-                pass
+            self.distances.pop((from_node, to_node), None)
+        finally:
+            self.lock.release()
 
     def change_cost(self, from_node, to_node, newCost):
+        self.lock.acquire()
         try:
-            self.distances[(from_node, to_node)]
-        except:
-            self.distances[(from_node, to_node)] = newCost
-            return True
-        if self.distances[(from_node, to_node)] != newCost:
+            oldCost = self.distances.get((from_node, to_node))
+            if oldCost == newCost:
+                return False
+            self.record_delta(from_node, to_node, oldCost, newCost)
             self.distances[(from_node, to_node)] = newCost
             return True
+        finally:
+            self.lock.release()
+
+    def record_delta(self, from_node, to_node, oldCost, newCost):  # called with the lock held
+        self.revision += 1
+        if oldCost is None or newCost is None:
+            self.version += 1
+            self.costPatches = []
         else:
-            return False
+            self.costPatches.append((from_node, to_node, newCost))
+        if self.trackDeltas:
+            self.deltas.append((from_node, to_node, oldCost, newCost))
+
+    def mark_nodes_changed(self):
+        self.lock.acquire()
+        self.nodesChanged = True
+        self.version += 1
+        self.revision += 1
+        self.costPatches = []
+        self.lock.release()
+
+    def snapshot(self):
+        self.lock.acquire()
+        try:
+            return GraphSnapshot(self)
+        finally:
+            self.lock.release()
+
+    def take_snapshot(self):  # snapshot and the deltas leading to it, taken atomically
+        self.lock.acquire()
+        try:
+            deltas = self.deltas
+            nodesChanged = self.nodesChanged
+            self.deltas = []
+            self.nodesChanged = False
+            return GraphSnapshot(self), deltas, nodesChanged
+        finally:
+            self.lock.release()
+
+    def take_deltas(self):  # for a repair on the live graph, called with the lock held
+        deltas = self.deltas
+        self.deltas = []
+        return deltas
+
+    def get_csr(self, nodeList):
+        return self.snapshot().get_csr(nodeList)
+
+    def consume_cost_patches(self, count):
+        self.lock.acquire()
+        del self.costPatches[:count]
+        self.lock.release()
 
     def print_nodes(self):
         for node in self.nodes:
@@ -235,6 +333,32 @@ class Graph:
                 print str(node.idx) + ' --> ' + str(dest.idx) + ' | ' + str(self.distances[(node, dest)])
 
 
+class GraphSnapshot:  # read-only view of a Graph, adjacency tuples are shared with the live graph
+    def __init__(self, graph):
+        self.graph = graph
+        self.nodes = frozenset(graph.nodes)
+        self.edges = defaultdict(tuple, graph.edges)
+        self.inEdges = dict(graph.inEdges)
+        self.distances = dict(graph.distances)
+        self.version = graph.version
+        self.revision = graph.revision
+        self.costPatches = list(graph.costPatches)
+
+    def get_csr(self, nodeList):
+        graph = self.graph
+        csr = graph.csr
+        if csr is None or csr.version != self.version:
+            csr = spfEngine.CSRGraph(self, nodeList)
+        else:
+            for from_node, to_node, cost in self.costPatches:
+                if not csr.patch_cost(from_node, to_node, cost):
+                    csr = spfEngine.CSRGraph(self, nodeList)
+                    break
+        graph.consume_cost_patches(len(self.costPatches))
+        graph.csr = csr
+        return csr
+
+
 def dijsktra(graph, initial, nodeList):
     visited = {initial: 0}
     path = {}
@@ -269,6 +393,45 @@ def dijsktra(graph, initial, nodeList):
     return visited, path
 
 
+def next_hop(path, dest, init):
+    nextHop = path[dest]
+    previousHop = dest
+    routerNextHop = previousHop
+    while nextHop != init:
+        routerNextHop = previousHop
+        previousHop = nextHop
+        nextHop = path[nextHop]
+    if previousHop.is_network():
+        return routerNextHop
+    else:
+        return previousHop
+
+
+def run_spf(graph, initial, nodeList):  # incremental mode falls back to heap for full runs
+    if spf_engine == 'legacy':
+        visited, path = dijsktra(graph, initial, nodeList)
+        nextHops = {}
+        for dest in path.keys():
+            nextHops[dest] = [next_hop(path, dest, initial)]
+        return visited, path, nextHops
+    return spfEngine.heap_dijkstra(graph, initial, nodeList)
+
+
+def set_spf_engine(engine):
+    global spf_engine
+    if engine not in SPF_ENGINES:
+        return False
+    spf_engine = engine
+    return True
+
+
+def set_spf_workers(workers):
+    if workers < 0:
+        return False
+    spfEngine.set_workers(workers)
+    return True
+
+
 class RouteTable:
     def __init__(self, ospfdb, area):
         self.routes = {}  # {destPrefix:Route(),}
@@ -276,10 +439,10 @@ class RouteTable:
         self.ospfDB = ospfdb
         self.area = area
 
-    def add_route(self, dest, intf, metric, install, isnexthop):
+    def add_route(self, dest, intfs, metric, install, isnexthop):
         if not install:
             return
-        route = Route(intf, dest, metric, isnexthop)
+        route = Route(intfs, dest, metric, isnexthop)
         if dest.address not in self.prefixes.keys():
             self.prefixes[dest.address] = dest
             self.routes[dest.address] = route
@@ -287,8 +450,21 @@ class RouteTable:
             self.prefixes[dest.address] = dest
             self.routes[dest.address] = route
 
-    def process_routes(self, oldTable, adjacencies):
+    def copy(self, exclude):
+        table = RouteTable(self.ospfDB, self.area)
+        table.routes = dict(self.routes)
+        table.prefixes = dict(self.prefixes)
+        for address in exclude:
+            table.routes.pop(address, None)
+            table.prefixes.pop(address, None)
+        return table
+
+    def report_route(self, address, result):
+        self.ospfDB.set_route_status(address, self.area, result)
+
+    def process_routes(self, oldTable, adjacencies, only=None):
         addressManagment.print_service('\nProcessing Routes...\n')
+        transaction = addressManagment.FIBTransaction(self.report_route)
         newRoutes = set(self.routes.keys())
         addressManagment.print_service('New Routes: ' + str(newRoutes))
         if oldTable is None:
@@ -299,11 +475,10 @@ class RouteTable:
                     dest = self.prefixes[dest]
                 route = self.routes[dest.address]
                 if dest.address not in self.ospfDB.localRoutingTable.keys():
-                    for neighbor in adjacencies.values():
-                        if self.routes[dest].intf == neighbor.linkLocal:
-                            if self.ospfDB.add_route(dest.address, route.metric, self.area):
-                                addressManagment.add_route(dest.get_full_address(), neighbor, route.metric, False)
-                            break
+                    vias = route.get_adjacencies(adjacencies)
+                    if len(vias) > 0:
+                        if self.ospfDB.add_route(dest.address, route.metric, self.area):
+                            transaction.add_route(dest.address, dest.get_full_address(), vias, route.metric, False)
         else:
             oldRoutes = set(oldTable.routes.keys())
             routesToAdd = newRoutes - oldRoutes
@@ -311,6 +486,10 @@ class RouteTable:
             routesToUpdate = newRoutes.intersection(oldRoutes)
             addressManagment.print_service('Routes to update area ' + self.area + ': ' + str(routesToUpdate))
             routesToDelete = oldRoutes - newRoutes
+            if only is not None:  # partial route calculation only touches the changed prefixes
+                routesToAdd &= only
+                routesToUpdate &= only
+                routesToDelete &= only
             addressManagment.print_service('Routes to delete area ' + self.area + ': ' + str(routesToDelete))
             for dest in routesToAdd:    #routes to add
                 try:
@@ -319,61 +498,55 @@ class RouteTable:
                     dest = self.prefixes[dest]
                 route = self.routes[dest.address]
                 if dest.address not in self.ospfDB.localRoutingTable.keys():
-                    for neighbor in adjacencies.values():
-                        if route.intf == neighbor.linkLocal:
-                            if self.ospfDB.add_route(dest.address, route.metric, self.area):
-                                addressManagment.add_route(dest.get_full_address(), neighbor, route.metric, route.isNextHop)
-                            break
+                    vias = route.get_adjacencies(adjacencies)
+                    if len(vias) > 0:
+                        if self.ospfDB.add_route(dest.address, route.metric, self.area):
+                            transaction.add_route(dest.address, dest.get_full_address(), vias, route.metric,
+                                                  route.isNextHop)
             for dest in routesToUpdate: # routes to update
                 try:
                     dest = self.prefixes[dest].dest
                 except:
                     dest = self.prefixes[dest]
                 route = self.routes[dest.address]
-                for neighbor in adjacencies.values():
-                    if route.intf == neighbor.linkLocal:
-                        if self.ospfDB.add_route(dest.address, route.metric, self.area):
-                            addressManagment.update_cost(dest.get_full_address(), neighbor, route.metric, route.isNextHop)
-                        break
+                vias = route.get_adjacencies(adjacencies)
+                if len(vias) > 0:
+                    if self.ospfDB.add_route(dest.address, route.metric, self.area):
+                        transaction.add_route(dest.address, dest.get_full_address(), vias, route.metric,
+                                              route.isNextHop)
             for dest in routesToDelete:
-                if oldTable.routes[dest].intf[0] == 'f':
-                    for neighbor in adjacencies.values():
-                        if oldTable.routes[dest].intf == neighbor.linkLocal:
-                            try:
-                                route = oldTable.prefixes[dest].dest
-                            except:
-                                route = oldTable.prefixes[dest]
-                            via = neighbor.linkLocal
-                            dev = neighbor.intfId
-                            if route.length == 128:
-                                prefix = route.address
-                            else:
-                                prefix = route.address + '/' + str(route.length)
-                            addressManagment.del_route_via(prefix, dev, via)
-                            addressManagment.del_route(prefix, dev)
-                            self.ospfDB.remove_route(route.address, self.area)
-                            break
+                try:
+                    route = oldTable.prefixes[dest].dest
+                except:
+                    route = oldTable.prefixes[dest]
+                if route.length == 128:
+                    prefix = route.address
                 else:
-                    try:
-                        route = oldTable.prefixes[dest].dest
-                    except:
-                        route = oldTable.prefixes[dest]
-                    if route.length == 128:
-                        prefix = route.address
-                    else:
-                        prefix = route.address + '/' + str(route.length)
-                    addressManagment.del_route(prefix, oldTable.routes[dest].intf)
-                    self.ospfDB.remove_route(route.address, self.area)
-                addressManagment.print_service('Done\nRouter_Linux: ')
+                    prefix = route.address + '/' + str(route.length)
+                transaction.del_route(prefix)  # the FIB mirror knows every path and the metric of the old route
+                self.ospfDB.remove_route(route.address, self.area)
+        fibWriter.submit(transaction)
+        addressManagment.print_service('Done\nRouter_Linux: ')
 
 
 class Route:
-    def __init__(self, intfId, dest, metric, isnexthop):
-        self.intf = intfId  # Interface.intfId
+    def __init__(self, intfIds, dest, metric, isnexthop):
+        self.intf = intfIds[0]  # Interface.intfId
+        self.nextHops = intfIds  # [intfId,] equal-cost paths, intf is the first one
+        self.backups = []  # [intfId,] loop-free alternate used when every next hop is lost
         self.dest = dest
         self.metric = metric
         self.isNextHop = isnexthop
 
+    def get_adjacencies(self, adjacencies):
+        out = []
+        for intf in self.nextHops:
+            for neighbor in adjacencies.values():
+                if intf == neighbor.linkLocal:
+                    out.append(neighbor)
+                    break
+        return out
+
 
 class RouteManager:
     def __init__(self, area):
@@ -412,41 +585,59 @@ class RouteManager:
             return False
 
     def install_routes(self, visited, path, initial, ospfDB, oldRouteTable):
-        install = True
         newRouteTable = RouteTable(ospfDB, self.areaID)
         for dest in visited.keys():
-            isNextHop = False
-            if dest.idx != initial.idx:  # if not initial node
-                if initial.idx in dest.neighbors:  # check if node is adjacent to initial node
-                    isNextHop = True
-                for prefix in dest.get_prefixes().values():
-                    install = self.check_route(prefix, visited[dest], ospfDB, newRouteTable, True)
-                    try:
-                        intfId = self.adjacencies[path[dest].idx].linkLocal
-                    except:
-                        intfId = ospfDB.get_intf_address_for_neighbor(path[dest].idx, self.areaID)
-                        addressManagment.print_service('got adjacement from intf')
-                    if isNextHop:
-                        newRouteTable.add_route(prefix, intfId, visited[dest], install, True)
-                    else:
-                        newRouteTable.add_route(prefix, intfId, visited[dest], install, False)
-                for prefix in dest.interAreaPrefixes.values():
-                    try:
-                        intfId = self.adjacencies[path[dest].idx].linkLocal
-                    except:
-                        intfId = ospfDB.get_intf_address_for_neighbor(path[dest].idx, self.areaID)
-                        addressManagment.print_service('got adjacement from intf')
-                    install = self.check_route(prefix, visited[dest] + prefix.metric, ospfDB, newRouteTable, False)
-                    if isNextHop:
-                        newRouteTable.add_route(prefix, intfId, prefix.metric + visited[dest], install, True)
-                    else:
-                        newRouteTable.add_route(prefix, intfId, prefix.metric + visited[dest], install, False)
+            self.add_destination_routes(newRouteTable, dest, visited, path, initial, ospfDB, None)
         if oldRouteTable is not None:
             newRouteTable.process_routes(oldRouteTable, self.adjacencies)
         else:
             newRouteTable.process_routes(None, self.adjacencies)
         return newRouteTable
 
+    def update_prefix_routes(self, visited, path, initial, ospfDB, oldRouteTable, addresses, owners):
+        newRouteTable = oldRouteTable.copy(addresses)
+        for dest in owners:
+            if dest in visited:
+                self.add_destination_routes(newRouteTable, dest, visited, path, initial, ospfDB, addresses)
+        newRouteTable.process_routes(oldRouteTable, self.adjacencies, addresses)
+        return newRouteTable
+
+    def get_next_hop_addresses(self, nextHops, ospfDB):
+        out = []
+        for nextHop in sorted(nextHops, key=lambda node: node.idx):
+            try:
+                intfId = self.adjacencies[nextHop.idx].linkLocal
+            except:
+                intfId = ospfDB.get_intf_address_for_neighbor(nextHop.idx, self.areaID)
+                addressManagment.print_service('got adjacement from intf')
+            if intfId not in out:
+                out.append(intfId)
+        return out
+
+    def add_destination_routes(self, newRouteTable, dest, visited, path, initial, ospfDB, addresses):
+        install = True
+        isNextHop = False
+        if dest.idx != initial.idx:  # if not initial node
+            if initial.idx in dest.neighbors:  # check if node is adjacent to initial node
+                isNextHop = True
+            intfIds = self.get_next_hop_addresses(path[dest], ospfDB)
+            for prefix in dest.get_prefixes().values():
+                if addresses is not None and prefix.address not in addresses:
+                    continue
+                install = self.check_route(prefix, visited[dest], ospfDB, newRouteTable, True)
+                if isNextHop:
+                    newRouteTable.add_route(prefix, intfIds, visited[dest], install, True)
+                else:
+                    newRouteTable.add_route(prefix, intfIds, visited[dest], install, False)
+            for prefix in dest.interAreaPrefixes.values():
+                if addresses is not None and prefix.address not in addresses:
+                    continue
+                install = self.check_route(prefix, visited[dest] + prefix.metric, ospfDB, newRouteTable, False)
+                if isNextHop:
+                    newRouteTable.add_route(prefix, intfIds, prefix.metric + visited[dest], install, True)
+                else:
+                    newRouteTable.add_route(prefix, intfIds, prefix.metric + visited[dest], install, False)
+
 
 class Adjacency:
     def __init__(self, intfId, linkLocal):
@@ -476,14 +667,22 @@ class DijkstraManager:
         self.routeManager = RouteManager(areaID)
         self.changes = False
         self.mainChange = False
+        self.prefixChanges = set()  # addresses waiting for a partial route calculation
+        self.prefixOwners = {}  # {address: set(nodeId1, nodeId2)}
         self.work = True
         self.visited = {}
         self.path = {}
         self.graphPath = {}
         self.areaID = areaID
         self.oldRouteTable = None
+        self.spfTree = spfEngine.IncrementalSPF()
+        self.graph.trackDeltas = True
+        self.scheduler = spfScheduler.SPFScheduler()
+        self.lfa = lfaManager.LFAManager(areaID)
+        self.lsdb = ospfDB.get_lsdb(areaID)
+        gracefulRestart.restart.register(areaID, self.area_synchronized, self.refresh_routing)
 
-        ospfDB.get_lsdb(areaID).set_dijkstra_manager(self)
+        self.lsdb.set_dijkstra_manager(self)
 
         self.init = self.create_self_router_node(ospfDB)
 
@@ -493,6 +692,7 @@ class DijkstraManager:
 
     def __del__(self):
         self.work = False
+        self.scheduler.stop()
 
     def get_route_manager(self):
         return self.routeManager
@@ -541,6 +741,7 @@ class DijkstraManager:
         except:
             return
         self.graph.remove_node(node)
+        self.graph.mark_nodes_changed()
         del self.nodes[id]
         self.update_changes()
 
@@ -600,19 +801,6 @@ class DijkstraManager:
         self.graph.change_cost(node1, node2, cost)
         self.update_changes()
 
-    def next_hop(self, path, dest, init):
-        nextHop = path[dest]
-        previousHop = dest
-        routerNextHop = previousHop
-        while nextHop != init:
-            routerNextHop = previousHop
-            previousHop = nextHop
-            nextHop = path[nextHop]
-        if previousHop.is_network():
-            return routerNextHop
-        else:
-            return previousHop
-
     def add_prefix(self, nodeID, prefix):
         try:
             node = self.nodes[nodeID]
@@ -623,24 +811,29 @@ class DijkstraManager:
                 node = NetworkNode(nodeID, [], None, False)
             else:
                 node = RouterNode(nodeID, [], None, False)
+            self.graph.mark_nodes_changed()
+            self.update_changes()
         self.nodes[node.idx] = node
         node.add_prefixes(prefix)
-        self.update_changes()
+        self.update_prefix_changes(node.idx, prefix.address)
 
     def remove_prefix(self, nodeID, prefix):
         node = self.nodes[nodeID]
         node.remove_prefixes(prefix)
-        self.update_changes()
+        if type(prefix) is str:
+            self.update_prefix_changes(node.idx, prefix)
+        else:
+            self.update_prefix_changes(node.idx, prefix.address)
 
     def add_inter_area_prefix(self, nodeId, prefix):
         node = self.nodes[nodeId]
         node.add_inter_area_prefix(prefix)
-        self.update_changes()
+        self.update_prefix_changes(node.idx, prefix.address)
 
     def remove_inter_area_prefix(self, nodeId, prefix):
         node = self.nodes[nodeId]
         node.remove_inter_area_prefix(prefix)
-        self.update_changes()
+        self.update_prefix_changes(node.idx, prefix)
 
     def add_adjacency(self, neighbor, intfId, linkLocal):
         self.routeManager.add_adjacency(neighbor, intfId, linkLocal)
@@ -648,6 +841,11 @@ class DijkstraManager:
     def remove_adjacency(self, neighbor, intfId):
         self.routeManager.remove_adjacency(neighbor, intfId)
 
+    def fast_reroute(self, neighbor):
+        adjacency = self.routeManager.adjacencies.get(neighbor)
+        if adjacency is not None:
+            self.lfa.activate_backups(self.oldRouteTable, adjacency, self.routeManager.adjacencies)
+
     def update_self_node_is_inter_area(self, nodeId, isInterArea):
         node = self.get_node(nodeId)
         node.isInterArea = isInterArea
@@ -659,7 +857,7 @@ class DijkstraManager:
         for i in self.visited.keys():
             out1[i.idx] = self.visited[i]
         for i in self.path.keys():
-            out2[i.idx] = self.path[i].idx
+            out2[i.idx] = [hop.idx for hop in self.path[i]]
         print '\nArea ' + self.areaID
         print 'visited nodes:'
         print out1
@@ -706,6 +904,8 @@ class DijkstraManager:
     def kill_route_manager(self, ospfDb):
         overlay = ospfDb.overlayLsdb
         self.work = False
+        self.scheduler.stop()
+        gracefulRestart.restart.unregister(self.areaID)
         if ospfDb.isInterArea:
             selfnode = self.get_node(ospfDb.routerId)
             overlay.update_neighbors(self.areaID, {selfnode.idx: selfnode})
@@ -714,31 +914,120 @@ class DijkstraManager:
     def update_changes(self):
         self.changes = True
         self.mainChange = True
+        self.scheduler.schedule()
 
     def refresh_routing(self):
         self.changes = True
+        self.scheduler.schedule()
+
+    def area_synchronized(self):  # graceful restart only trusts SPF runs started once this holds
+        for intf in self.lsdb.interfaceList:
+            if not intf.is_synchronized():
+                return False
+        return True
+
+    def update_prefix_changes(self, nodeId, address):
+        address = address.split('/')[0]
+        self.graph.lock.acquire()  # the SPF thread takes prefixChanges under the same lock
+        try:
+            self.prefixOwners.setdefault(address, set()).add(nodeId)
+            self.prefixChanges.add(address)
+            self.mainChange = True
+            self.scheduler.schedule()
+        finally:
+            self.graph.lock.release()
+
+    def refresh_prefixes(self, addresses):
+        self.graph.lock.acquire()
+        try:
+            self.prefixChanges.update(addresses)
+            self.scheduler.schedule()
+        finally:
+            self.graph.lock.release()
+
+    def take_prefix_changes(self):  # an address added after the swap lands in the new set and schedules a run
+        self.graph.lock.acquire()
+        try:
+            addresses = self.prefixChanges
+            self.prefixChanges = set()
+            return addresses
+        finally:
+            self.graph.lock.release()
+
+    def get_prefix_owners(self, addresses):
+        owners = set()
+        for address in addresses:
+            for nodeId in list(self.prefixOwners.get(address, ())):
+                node = self.nodes.get(nodeId)
+                if node is None:
+                    self.prefixOwners[address].discard(nodeId)
+                    continue
+                if node.has_prefix(address):
+                    owners.add(node)
+                else:
+                    self.prefixOwners[address].discard(nodeId)
+        return owners
+
+    def run_prc(self, ospfDB):
+        addresses = self.take_prefix_changes()
+        owners = self.get_prefix_owners(addresses)
+        self.oldRouteTable = self.routeManager.update_prefix_routes(self.visited, self.path, self.init, ospfDB,
+                                                                    self.oldRouteTable, addresses, owners)
+        self.update_backups(ospfDB, addresses, owners)
+        if ospfDB.isInterArea:
+            self.update_inter_area_nodes(ospfDB)
+        if self.mainChange:
+            for routeManager in ospfDB.routingGraph.values():
+                if routeManager.areaID != self.areaID:
+                    routeManager.refresh_prefixes(addresses)
+            self.mainChange = False
+        print datetime.datetime.now().strftime('%H:%M:%S.%f') + ' Area ' + str(
+            self.areaID) + ' prefix routes converged'
+
+    def calculate_spf(self, initial):
+        self.graph.lock.acquire()
+        try:
+            repair = spf_engine == 'incremental' and self.spfTree.ready and not self.graph.nodesChanged
+            if repair:
+                deltas = self.graph.take_deltas()
+            else:
+                graph, deltas, nodesChanged = self.graph.take_snapshot()
+        finally:
+            self.graph.lock.release()
+        if repair:  # reads the live graph unlocked, changes made meanwhile are in the next run's deltas
+            return self.spfTree.repair(self.graph, initial, self.nodes, deltas)
+        if spf_engine != 'incremental':
+            self.spfTree.ready = False
+            return run_spf(graph, initial, self.nodes)
+        return self.spfTree.full(graph, initial, self.nodes)
+
+    def print_spf_statistics(self):
+        self.scheduler.print_statistics('Area ' + str(self.areaID))
+        self.lfa.print_statistics()
+
+    def update_backups(self, ospfDB, addresses=None, owners=None):  # addresses: only those routes, see run_prc
+        self.lfa.compute_backups(self.graph, self.nodes, self.init, self.visited, self.oldRouteTable,
+                                 self.routeManager, ospfDB, addresses, owners)
 
     def run(self, initial, ospfDB):
-        while self.work:
-            if self.changes:
-                self.visited, self.path = dijsktra(self.graph, initial, self.nodes)
-                aux = {}
-                for dest in self.path.keys():
-                    aux[dest] = self.next_hop(self.path, dest, self.init)
-                    self.graphPath = self.path
-                self.path = aux
+        while self.work and self.scheduler.wait():
+            if self.changes or (self.prefixChanges and self.oldRouteTable is None):
+                self.changes = False  # cleared first so changes arriving during the run schedule another one
+                self.take_prefix_changes()
+                synchronized = self.area_synchronized()
+                self.visited, self.graphPath, self.path = self.calculate_spf(initial)
                 self.oldRouteTable = self.routeManager.install_routes(self.visited, self.path, initial, ospfDB,
                                                                       self.oldRouteTable)
+                self.update_backups(ospfDB)
                 if ospfDB.isInterArea:
                     self.update_inter_area_nodes(ospfDB)
-                self.changes = False
                 if self.mainChange:
                     for routeManager in ospfDB.routingGraph.values():
                         if routeManager.areaID != self.areaID:
                             routeManager.refresh_routing()
                     self.mainChange = False
+                gracefulRestart.restart.converged(self.areaID, synchronized)
                 print datetime.datetime.now().strftime('%H:%M:%S.%f') + ' Area ' + str(
                     self.areaID) + ' tree and routes converged'
-                threading._sleep(2)
-            else:
-                threading._sleep(2)
+            elif self.prefixChanges:
+                self.run_prc(ospfDB)
@@ -0,0 +1,241 @@
+import collections
+import commands
+import errno
+import fibMirror
+import netlinkManager
+import re
+import subprocess
+import time
+
+BATCH_FAILED = -1  # ip -batch reports which line failed but not why
+ROUTE_PROTOCOL = netlinkManager.RTPROT_OSPF  # every route we install carries it, nothing else is ever flushed
+route_table = netlinkManager.RT_TABLE_MAIN
+
+
+def route_tag():
+    return ' proto ' + str(ROUTE_PROTOCOL) + ' table ' + str(route_table)
+
+
+def route_arguments(route, vias, metric, isNextHop):  # vias: [Adjacency,], more than one -> multipath route
+    if len(vias) == 1:
+        if isNextHop:
+            return 'route replace ' + route + ' dev ' + vias[0].intfId + ' metric ' + metric + route_tag()
+        return 'route replace ' + route + ' via ' + vias[0].linkLocal + ' dev ' + vias[0].intfId + ' metric ' + \
+            metric + route_tag()
+    command = 'route replace ' + route + ' metric ' + metric + route_tag()
+    for via in vias:
+        if isNextHop:
+            command += ' nexthop dev ' + via.intfId
+        else:
+            command += ' nexthop via ' + via.linkLocal + ' dev ' + via.intfId
+    return command
+
+
+def delete_arguments(route, dev=None, via=None, metric=None):
+    command = 'route del ' + route
+    if via is not None:
+        command += ' via ' + via
+    if dev is not None:
+        command += ' dev ' + dev
+    if metric is not None:
+        command += ' metric ' + str(metric)
+    return command + route_tag()
+
+
+def deletes_first(operation, fib):  # an install whose old route has another metric, replace would leave it in place
+    old = fib.get(operation.prefix)
+    return old is not None and old.metric != int(operation.metric)
+
+
+def plan(operations, fib):  # [(operation index or None, 'add' | 'del', operation, metric),] messages to send
+    out = []
+    results = [0] * len(operations)
+    for i in range(len(operations)):
+        operation = operations[i]
+        old = fib.get(operation.prefix)
+        if operation.is_delete():
+            if operation.whole_route():
+                if old is None:  # never installed, nothing of ours to remove
+                    results[i] = errno.ESRCH
+                    continue
+                out.append((i, 'del', operation, old.metric))
+            else:
+                out.append((i, 'del', operation, None))
+            continue
+        if deletes_first(operation, fib):  # same metric: replaced in place
+            out.append((None, 'del', operation, old.metric))
+        out.append((i, 'add', operation, operation.metric))
+    return out, results
+
+
+class KernelBackend:
+    def dump(self):
+        return fibMirror.read_kernel_routes('ip -6 route show' + route_tag())
+
+    def flush(self):  # one bulk delete of our protocol, static and kernel routes are left alone
+        return commands.getoutput('ip -6 route flush' + route_tag())
+
+    def show(self):
+        return commands.getoutput('ip -6 route show' + route_tag())
+
+
+class NetlinkBackend(KernelBackend):
+    name = 'netlink'
+
+    def available(self):
+        return netlinkManager.available()
+
+    def commit(self, operations, fib):  # [errno,] per operation
+        messages, results = plan(operations, fib)
+        requests = []
+        for owner, kind, operation, metric in messages:
+            if kind == 'add':
+                requests.append(netlinkManager.add_message(operation.prefix, operation.vias, metric,
+                                                           operation.isNextHop, ROUTE_PROTOCOL, route_table))
+            else:
+                requests.append(netlinkManager.del_message(operation.prefix, operation.dev, operation.via, metric,
+                                                           ROUTE_PROTOCOL, route_table))
+        for message, result in zip(messages, netlinkManager.transact(requests)):
+            if message[0] is not None:
+                results[message[0]] = result
+        return results
+
+
+class ShellBackend(KernelBackend):
+    name = 'shell'
+
+    def available(self):
+        return True
+
+    def commit(self, operations, fib):  # single ip -batch run, failed lines are reported as "Command failed -:<line>"
+        messages, results = plan(operations, fib)
+        lines = []
+        for owner, kind, operation, metric in messages:
+            if kind == 'add':
+                lines.append(route_arguments(operation.prefix, operation.vias, str(metric), operation.isNextHop))
+            else:
+                lines.append(delete_arguments(operation.prefix, operation.dev, operation.via, metric))
+        if len(lines) == 0:
+            return results
+        process = subprocess.Popen(['ip', '-6', '-force', '-batch', '-'], stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output = process.communicate('\n'.join(lines) + '\n')[0]
+        failed = set([int(line) for line in re.findall(r'Command failed -:(\d+)', output)])
+        for i in range(len(messages)):
+            if messages[i][0] is not None and i + 1 in failed:
+                results[messages[i][0]] = BATCH_FAILED
+        return results
+
+
+class MemoryBackend:  # simulated kernel, no root needed, for load tests of route computation and programming
+    name = 'memory'
+
+    def __init__(self, writeLatency=0.0001, routeLatency=0.00001, history=100000):
+        self.writeLatency = writeLatency  # seconds per batched write, a syscall on a real kernel
+        self.routeLatency = routeLatency  # seconds per route message
+        self.routes = {}  # {normalized prefix: {metric: FIBEntry}}
+        self.log = collections.deque(maxlen=history)  # (time, 'add' | 'del', prefix, metric, errno)
+        self.writes = 0
+        self.messages = 0
+        self.errors = 0
+
+    def available(self):
+        return True
+
+    def commit(self, operations, fib):
+        messages, results = plan(operations, fib)
+        now = time.time()
+        for owner, kind, operation, metric in messages:
+            if kind == 'add':
+                result = self.add(operation, metric)
+            else:
+                result = self.delete(operation, metric)
+            self.log.append((now, kind, operation.prefix, metric, result))
+            if owner is not None:
+                results[owner] = result
+                if result != 0:
+                    self.errors += 1
+        writes = (len(messages) + netlinkManager.MAX_BATCH_MESSAGES - 1) / netlinkManager.MAX_BATCH_MESSAGES
+        self.writes += writes
+        self.messages += len(messages)
+        time.sleep(writes * self.writeLatency + len(messages) * self.routeLatency)
+        return results
+
+    def add(self, operation, metric):
+        if len(operation.vias) == 0:
+            return errno.ENODEV
+        entry = fibMirror.FIBEntry(fibMirror.normalize(operation.prefix), [], int(metric))
+        for via in operation.vias:
+            if operation.isNextHop:
+                entry.paths.append((via.intfId, None))
+            else:
+                entry.paths.append((via.intfId, fibMirror.normalize_address(via.linkLocal)))
+        self.routes.setdefault(entry.prefix, {})[entry.metric] = entry
+        return 0
+
+    def delete(self, operation, metric):
+        prefix = fibMirror.normalize(operation.prefix)
+        via = None
+        if operation.via is not None:
+            via = fibMirror.normalize_address(operation.via)
+        for routeMetric, entry in sorted(self.routes.get(prefix, {}).items()):
+            if metric is not None and routeMetric != int(metric):
+                continue
+            paths = [(dev, gateway) for dev, gateway in entry.paths
+                     if (operation.dev is None or dev == operation.dev) and (via is None or gateway == via)]
+            if len(paths) == 0:
+                continue
+            entry.paths = [path for path in entry.paths if path not in paths]
+            if len(entry.paths) == 0:
+                del self.routes[prefix][routeMetric]
+                if len(self.routes[prefix]) == 0:
+                    del self.routes[prefix]
+            return 0
+        return errno.ESRCH
+
+    def dump(self):  # the best route of every prefix, like the mirror keeps it
+        out = {}
+        for prefix, entries in self.routes.items():
+            out[prefix] = entries[min(entries.keys())]
+        return out
+
+    def flush(self):
+        self.routes = {}
+
+    def show(self):
+        lines = []
+        for prefix in sorted(self.routes.keys()):
+            for metric in sorted(self.routes[prefix].keys()):
+                entry = self.routes[prefix][metric]
+                lines.append(prefix + ' metric ' + str(metric) + ' ' + ', '.join(
+                    [dev if gateway is None else gateway + '%' + dev for dev, gateway in entry.paths]))
+        lines.append('simulated kernel: ' + str(self.writes) + ' writes, ' + str(self.messages) + ' messages, ' +
+                     str(self.errors) + ' errors')
+        return '\n'.join(lines)
+
+
+backends = {'netlink': NetlinkBackend(), 'shell': ShellBackend(), 'memory': MemoryBackend()}
+backend = 'netlink'  # selected FIB backend, netlink falls back to the ip command when the socket is unavailable
+
+
+def get_backend():
+    selected = backends[backend]
+    if not selected.available():
+        return backends['shell']
+    return selected
+
+
+def set_route_table(table):  # only while nothing is installed, routes already in the old table would be orphaned
+    global route_table
+    if table < 1 or table > 0xffffffff:
+        return False
+    route_table = table
+    return True
+
+
+def set_backend(name):
+    global backend
+    if name not in backends:
+        return False
+    backend = name
+    return True
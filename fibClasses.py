@@ -0,0 +1,68 @@
+import socket
+
+
+class PrefixClass:  # a group of prefixes installed before every class that comes after it
+    def __init__(self, name, minLength=0, maxLength=128, prefixes=None):
+        self.name = name
+        self.minLength = minLength
+        self.maxLength = maxLength
+        self.prefixes = None  # [(network as integer, length),] covering prefixes, None matches any address
+        if prefixes is not None:
+            self.prefixes = []
+            for prefix in prefixes:
+                self.add_prefix(prefix)
+
+    def add_prefix(self, prefix):
+        address, length = split(prefix)
+        self.prefixes.append((address >> (128 - length) if length > 0 else 0, length))
+
+    def matches(self, address, length):
+        if length < self.minLength or length > self.maxLength:
+            return False
+        if self.prefixes is None:
+            return True
+        for network, coverLength in self.prefixes:
+            if length >= coverLength and (coverLength == 0 or address >> (128 - coverLength) == network):
+                return True
+        return False
+
+    def describe(self):
+        out = self.name + ' /' + str(self.minLength) + '-/' + str(self.maxLength)
+        if self.prefixes is not None:
+            out += ' within ' + ', '.join([to_string(network, length) for network, length in self.prefixes])
+        return out
+
+
+# loopback /128s first (next-hop resolution of other protocols), then configured infrastructure ranges
+classes = [PrefixClass('host', 128, 128), PrefixClass('infrastructure', prefixes=[]), PrefixClass('other')]
+
+
+def split(prefix):  # (address as integer, length)
+    if '/' in prefix:
+        address, length = prefix.split('/')
+    else:
+        address, length = prefix, '128'
+    return int(socket.inet_pton(socket.AF_INET6, address).encode('hex'), 16), int(length)
+
+
+def to_string(network, length):
+    address = network << (128 - length) if length > 0 else 0
+    data = ('%032x' % address).decode('hex')
+    return socket.inet_ntop(socket.AF_INET6, data) + '/' + str(length)
+
+
+def classify(prefix):  # index in classes, the last class takes whatever no rule matched
+    address, length = split(prefix)
+    for i in range(len(classes) - 1):
+        if classes[i].matches(address, length):
+            return i
+    return len(classes) - 1
+
+
+def add_infrastructure_prefix(prefix):
+    try:
+        split(prefix)
+    except (socket.error, ValueError):
+        return False
+    classes[1].add_prefix(prefix)
+    return True
@@ -0,0 +1,152 @@
+import commands
+import socket
+import threading
+
+
+class FIBEntry:
+    def __init__(self, prefix, paths, metric):
+        self.prefix = prefix
+        self.paths = paths  # [(dev, gateway),] gateway None for directly connected next hops
+        self.metric = metric
+
+    def print_entry(self):
+        print '\t' + self.prefix + ' metric ' + str(self.metric) + ' ' + ', '.join(
+            [dev if gateway is None else gateway + '%' + dev for dev, gateway in self.paths])
+
+
+class FIBMirror:  # routes this daemon has in the kernel, so installs never need to read the table back
+    def __init__(self):
+        self.entries = {}  # {normalized prefix: FIBEntry}
+        self.stale = set()  # prefixes kept from a previous instance and not reinstalled since
+        self.staleMarked = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, prefix):
+        return self.entries.get(normalize(prefix))
+
+    def set(self, prefix, vias, metric, isNextHop):
+        if isNextHop:
+            paths = [(via.intfId, None) for via in vias]
+        else:
+            paths = [(via.intfId, normalize_address(via.linkLocal)) for via in vias]
+        self.lock.acquire()
+        try:
+            self.entries[normalize(prefix)] = FIBEntry(normalize(prefix), paths, int(metric))
+            self.stale.discard(normalize(prefix))
+        finally:
+            self.lock.release()
+
+    def remove(self, prefix, dev=None, via=None):  # whole entry, or only the paths matching dev / via
+        prefix = normalize(prefix)
+        self.lock.acquire()
+        try:
+            entry = self.entries.get(prefix)
+            if entry is None:
+                return
+            if dev is not None or via is not None:
+                if via is not None:
+                    via = normalize_address(via)
+                entry.paths = [(pathDev, gateway) for pathDev, gateway in entry.paths
+                               if not ((dev is None or pathDev == dev) and (via is None or gateway == via))]
+                if len(entry.paths) > 0:
+                    return
+            del self.entries[prefix]
+            self.stale.discard(prefix)
+        finally:
+            self.lock.release()
+
+    def clear(self):
+        self.lock.acquire()
+        try:
+            self.entries = {}
+            self.stale = set()
+        finally:
+            self.lock.release()
+
+    def reconcile(self, kernel):  # replaces the mirror with what the kernel really has, returns (added, removed, changed)
+        self.lock.acquire()
+        try:
+            added = len([prefix for prefix in kernel if prefix not in self.entries])
+            removed = len([prefix for prefix in self.entries if prefix not in kernel])
+            changed = len([prefix for prefix, entry in kernel.items() if prefix in self.entries and
+                           (entry.metric != self.entries[prefix].metric or
+                            sorted(entry.paths) != sorted(self.entries[prefix].paths))])
+            self.entries = kernel
+            self.stale &= set(kernel.keys())
+        finally:
+            self.lock.release()
+        return added, removed, changed
+
+    def mark_stale(self):  # every known route has to be confirmed again, returns how many were marked
+        self.lock.acquire()
+        try:
+            self.stale = set(self.entries.keys())
+            self.staleMarked = len(self.stale)
+            return self.staleMarked
+        finally:
+            self.lock.release()
+
+    def stale_routes(self):
+        self.lock.acquire()
+        try:
+            return list(self.stale)
+        finally:
+            self.lock.release()
+
+    def print_fib(self):
+        print 'FIB mirror: ' + str(len(self.entries)) + ' routes'
+        for prefix in sorted(self.entries.keys()):
+            self.entries[prefix].print_entry()
+            if prefix in self.stale:
+                print '\t\tstale'
+
+
+def normalize_address(address):
+    return socket.inet_ntop(socket.AF_INET6, socket.inet_pton(socket.AF_INET6, address))
+
+
+def normalize(prefix):  # kernel style prefix, the length is always present
+    if '/' in prefix:
+        address, length = prefix.split('/')
+    else:
+        address, length = prefix, '128'
+    return normalize_address(address) + '/' + length
+
+
+def read_kernel_routes(command):  # {prefix: FIBEntry} for the unicast routes listed by an ip route show filter
+    out = {}
+    entry = None
+    for line in commands.getoutput(command).split('\n'):
+        words = line.split()
+        if len(words) == 0:
+            continue
+        if line[0] in ' \t':
+            if entry is not None and words[0] == 'nexthop':
+                entry.paths.append(read_path(words))
+            continue
+        entry = None
+        if words[0] in ('default', 'local', 'anycast', 'multicast', 'unreachable', 'prohibit', 'blackhole') \
+                or words[0].startswith('fe80') or 'proto' in words:
+            continue
+        try:
+            prefix = normalize(words[0])
+        except socket.error:  # not a route, e.g. the error of a table that does not exist yet
+            continue
+        metric = 0
+        if 'metric' in words:
+            metric = int(words[words.index('metric') + 1])
+        entry = FIBEntry(prefix, [], metric)
+        if 'dev' in words:
+            entry.paths.append(read_path(words))
+        out[entry.prefix] = entry
+    return out
+
+
+def read_path(words):
+    gateway = None
+    if 'via' in words:
+        gateway = normalize_address(words[words.index('via') + 1])
+    return words[words.index('dev') + 1], gateway
@@ -0,0 +1,174 @@
+import addressManagment
+import collections
+import errno
+import fibClasses
+import threading
+import time
+
+MAX_BATCH = 1024  # operations per kernel transaction
+
+
+class FIBWriter:  # applies route changes in the background, newer changes to a prefix replace queued ones
+    def __init__(self):
+        self.pending = [collections.OrderedDict() for i in fibClasses.classes]  # per class {prefix: FIBOperation}
+        self.classStart = [None] * len(fibClasses.classes)  # when the class got work while it was converged
+        self.classLast = [None] * len(fibClasses.classes)  # seconds the last drain of the class took
+        self.classMax = [0.0] * len(fibClasses.classes)
+        self.classWritten = [0] * len(fibClasses.classes)
+        self.condition = threading.Condition()
+        self.work = True
+        self.busy = False
+        self.thread = None
+        self.enqueued = 0  # operations handed to the writer
+        self.coalesced = 0  # operations replaced by a newer one before reaching the kernel
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.maxDepth = 0
+        self.lastBatch = 0
+        self.totalLatency = 0.0  # seconds between queueing and the kernel answer, over every written operation
+        self.maxLatency = 0.0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, transaction):
+        self.condition.acquire()
+        try:
+            if self.thread is None:
+                self.start()
+            for operation in transaction.operations:
+                pending = self.pending[operation.rank]
+                key = addressManagment.fibMirror.normalize(operation.prefix)
+                if key in pending:
+                    old = pending[key]
+                    if not operation.is_delete() or operation.whole_route() or old.is_delete():
+                        del pending[key]  # last write wins, the new operation goes to the back
+                        self.coalesced += 1
+                        operation.queued = min(operation.queued, old.queued)
+                    else:
+                        key = (key, operation.dev, operation.via)  # partial delete after an install keeps both
+                if self.classStart[operation.rank] is None:
+                    self.classStart[operation.rank] = operation.queued
+                pending[key] = operation
+                self.enqueued += 1
+            self.maxDepth = max(self.maxDepth, self.depth())
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def depth(self):
+        return sum([len(pending) for pending in self.pending])
+
+    def next_batch(self):
+        self.condition.acquire()
+        try:
+            while self.work and self.depth() == 0:
+                self.condition.wait()
+            if not self.work:
+                return None
+            transaction = addressManagment.FIBTransaction()
+            for pending in self.pending:  # classes drain in order, a batch only reaches into the next one
+                while len(pending) > 0 and len(transaction) < MAX_BATCH:
+                    transaction.add_operation(pending.popitem(last=False)[1])
+            self.busy = True
+            return transaction
+        finally:
+            self.condition.release()
+
+    def run(self):
+        while True:
+            transaction = self.next_batch()
+            if transaction is None:
+                return
+            try:
+                results = transaction.commit()
+                failed = len([result for result in results.values() if result != 0])
+            except Exception as e:  # the whole batch is lost, the thread keeps draining the queue
+                print 'FIB writer: batch of ' + str(len(transaction)) + ' operations failed: ' + str(e)
+                failed = len(transaction)
+                self.report_failure(transaction)
+            now = time.time()
+            self.condition.acquire()
+            try:
+                self.busy = False
+                self.batches += 1
+                self.lastBatch = len(transaction)
+                self.written += len(transaction)
+                self.failed += failed
+                for operation in transaction.operations:
+                    latency = now - operation.queued
+                    self.totalLatency += latency
+                    self.maxLatency = max(self.maxLatency, latency)
+                    self.classWritten[operation.rank] += 1
+                for rank in set([operation.rank for operation in transaction.operations]):
+                    if len(self.pending[rank]) == 0 and self.classStart[rank] is not None:
+                        self.classLast[rank] = now - self.classStart[rank]
+                        self.classMax[rank] = max(self.classMax[rank], self.classLast[rank])
+                        self.classStart[rank] = None
+                self.condition.notify_all()
+            finally:
+                self.condition.release()
+
+    def report_failure(self, transaction):  # owners of the lost operations see an errno like any refused route
+        for operation in transaction.operations:
+            if operation.key is not None and operation.report is not None:
+                try:
+                    operation.report(operation.key, errno.EIO)
+                except Exception as e:
+                    print 'FIB writer: failed to report ' + str(operation.key) + ': ' + str(e)
+
+    def flush(self, timeout=None):  # waits until everything queued so far reached the kernel
+        deadline = None if timeout is None else time.time() + timeout
+        self.condition.acquire()
+        try:
+            while self.work and (self.depth() > 0 or self.busy):
+                if deadline is not None:
+                    if time.time() >= deadline:
+                        return False
+                    self.condition.wait(deadline - time.time())
+                else:
+                    self.condition.wait()
+            return True
+        finally:
+            self.condition.release()
+
+    def stop(self):  # queued operations are dropped
+        self.condition.acquire()
+        try:
+            self.work = False
+            for pending in self.pending:
+                pending.clear()
+            self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+    def print_statistics(self):
+        print 'FIB writer:'
+        print '\tqueue depth: ' + str(self.depth()) + ' max: ' + str(self.maxDepth)
+        print '\tenqueued: ' + str(self.enqueued) + ' coalesced: ' + str(self.coalesced) + ' written: ' + str(
+            self.written) + ' failed: ' + str(self.failed)
+        print '\tbatches: ' + str(self.batches) + ' last batch: ' + str(self.lastBatch)
+        if self.written > 0:
+            print '\tlatency avg: ' + str(round(self.totalLatency / self.written * 1000, 3)) + 'ms max: ' + str(
+                round(self.maxLatency * 1000, 3)) + 'ms'
+        for rank in range(len(fibClasses.classes)):
+            out = '\t' + fibClasses.classes[rank].describe() + ': ' + str(len(self.pending[rank])) + ' pending, ' + \
+                str(self.classWritten[rank]) + ' written'
+            if self.classLast[rank] is not None:
+                out += ', converged in ' + str(round(self.classLast[rank] * 1000, 3)) + 'ms max ' + str(
+                    round(self.classMax[rank] * 1000, 3)) + 'ms'
+            print out
+
+
+writer = FIBWriter()
+async_fib = True  # SPF hands its route changes to the writer thread instead of waiting for the kernel
+
+
+def submit(transaction):  # {key: errno} when written synchronously, None when queued
+    if async_fib and writer.work:
+        writer.submit(transaction)
+        return None
+    return transaction.commit()
@@ -0,0 +1,149 @@
+import addressManagment
+import datetime
+import fibWriter
+import threading
+import time
+
+RESTART_TIMEOUT = 120.0  # seconds after startup when stale routes are swept even if SPF never settled
+SETTLE_TIME = 5.0  # seconds without a new SPF run, after every area converged, before the sweep
+
+
+class GracefulRestart:  # routes left by the previous instance stay in the kernel until SPF confirms or drops them
+    def __init__(self):
+        self.enabled = True  # keep routes across a restart, otherwise stale routes are flushed at startup
+        self.timeout = RESTART_TIMEOUT
+        self.settleTime = SETTLE_TIME
+        self.condition = threading.Condition()
+        self.active = False
+        self.started = None
+        self.areas = {}  # {areaID: time of the last SPF run started with the area synchronized, None before}
+        self.checks = {}  # {areaID: (synchronized(), refresh())}
+        self.refreshing = set()  # areas whose SPF run asked for on synchronization has not finished yet
+        self.swept = 0
+        self.confirmed = 0
+
+    def begin(self):  # at startup, once the mirror holds what the kernel kept
+        stale = addressManagment.fib.mark_stale()
+        if stale == 0:
+            return
+        if not self.enabled:
+            print 'Removing ' + str(stale) + ' routes left by the previous instance'
+            addressManagment.clear_routing()
+            return
+        print 'Graceful restart: ' + str(stale) + ' routes retained, sweep within ' + str(self.timeout) + 's'
+        self.condition.acquire()
+        try:
+            self.active = True
+            self.started = time.time()
+        finally:
+            self.condition.release()
+        thread = threading.Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+
+    def set_enabled(self, enabled):  # turning it off while routes are retained sweeps them right away
+        self.condition.acquire()
+        try:
+            self.enabled = enabled
+            if enabled or not self.active:
+                return
+            self.active = False
+            self.condition.notify()
+        finally:
+            self.condition.release()
+        self.sweep()
+
+    def register(self, areaID, synchronized, refresh):
+        self.condition.acquire()
+        try:
+            self.areas.setdefault(areaID, None)
+            self.checks[areaID] = (synchronized, refresh)
+        finally:
+            self.condition.release()
+
+    def unregister(self, areaID):  # the area's SPF stopped, the sweep no longer waits for it
+        self.condition.acquire()
+        try:
+            self.areas.pop(areaID, None)
+            self.checks.pop(areaID, None)
+            self.refreshing.discard(areaID)
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def converged(self, areaID, synchronized):  # an SPF run of the area finished and handed its routes to the FIB writer
+        self.condition.acquire()
+        try:
+            if areaID not in self.checks:
+                return
+            self.refreshing.discard(areaID)
+            if synchronized:
+                self.areas[areaID] = time.time()
+            else:  # started before the adjacencies settled, the LSDB may still be missing LSAs
+                self.areas[areaID] = None
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def sweep_due(self, now):
+        if now - self.started >= self.timeout:
+            return True
+        if len(self.areas) == 0 or None in self.areas.values():
+            return False
+        return now - max(self.areas.values()) >= self.settleTime
+
+    def run(self):
+        while True:
+            self.condition.acquire()
+            try:
+                if not self.active:
+                    return
+                if self.sweep_due(time.time()):
+                    self.active = False
+                    break
+                self.condition.wait(1.0)
+                pending = [(areaID, self.checks[areaID]) for areaID in self.checks.keys()
+                           if self.areas.get(areaID) is None and areaID not in self.refreshing]
+            finally:
+                self.condition.release()
+            for areaID, (synchronized, refresh) in pending:
+                if synchronized():
+                    self.condition.acquire()
+                    try:
+                        self.refreshing.add(areaID)
+                    finally:
+                        self.condition.release()
+                    refresh()  # the run that counts has to start after the area synchronized, asked for once
+        self.sweep()
+
+    def sweep(self):
+        fibWriter.writer.flush(self.settleTime)  # confirmations still queued must reach the mirror first
+        stale = addressManagment.fib.stale_routes()
+        transaction = addressManagment.FIBTransaction()
+        for prefix in stale:
+            transaction.del_route(prefix)
+        transaction.commit()
+        self.swept = len(stale)
+        self.confirmed = addressManagment.fib.staleMarked - self.swept
+        print datetime.datetime.now().strftime('%H:%M:%S.%f') + ' Graceful restart finished: ' + str(
+            self.confirmed) + ' routes confirmed, ' + str(self.swept) + ' stale routes removed'
+
+    def cancel(self):
+        self.condition.acquire()
+        try:
+            self.active = False
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def print_statistics(self):
+        if self.started is None:
+            print 'Graceful restart: not active'
+        elif self.active:
+            print 'Graceful restart: ' + str(len(addressManagment.fib.stale_routes())) + ' stale routes, ' + str(
+                int(self.timeout - (time.time() - self.started))) + 's left'
+        else:
+            print 'Graceful restart: ' + str(self.confirmed) + ' routes confirmed, ' + str(self.swept) + ' swept'
+
+
+restart = GracefulRestart()
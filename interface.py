@@ -16,6 +16,8 @@ STATES = {'Down': 0,
           'DR other': 4,
           'Backup': 5,
           'DR': 6}
+RECEIVE_SIZE = 5000  # bytes, largest packet read from the OSPF socket
+POOL_SIZE = 32  # receive buffers kept for reuse, packets are handled by one thread each
 
 
 class ActiveInterface:
@@ -107,6 +109,15 @@ class ActiveInterface:
                 neighbors.append(neighbor.neighborId)
         return neighbors
 
+    def is_synchronized(self):  # DR election done, adjacencies Full and nothing left to request or retransmit
+        if self.state == STATES['Down'] or self.state == STATES['Waiting']:
+            return False
+        lsdb = self.get_lsdb()
+        for neighbor in self.neighborList.values():
+            if not neighbor.neighbor_is_synchronized(lsdb):
+                return False
+        return self.updateManager.pending_updates() == 0
+
     def is_neighbor(self, neighborId):
         return neighborId in self.neighborList.keys()
 
@@ -236,6 +247,11 @@ class ActiveInterface:
         for intf in lsdb.interfaceList:
             self.updateManager.send_multicast_update(intf, [idx])
 
+    def link_down(self):  # carrier lost: neighbors are gone now, not after the dead interval
+        for neighbor in self.neighborList.values():
+            neighbor.active = False
+            neighbor.neighbor_down()
+
     def shutdown(self):
         lsdb = self.ospfDb.lsdbs[self.areaId]
         self.active = False
@@ -309,12 +325,13 @@ class Waiting:
 
     def run_receive(self, interface, addrList):
         global waiting
+        data = receiveBuffers.get()
         while interface.active and waiting:
-            data, sender = self.receiver_socket.recvfrom(5000)
+            length, sender = self.receiver_socket.recvfrom_into(data, RECEIVE_SIZE)
             if sender[0].split('%')[0] not in addrList:
-                check, destination = packetManager.check_data(data, sender, interface)
+                check, destination = packetManager.check_data(data, sender, interface, length)
                 if check and not check_sender(interface.address, sender):
-                    packet = packetManager.unpack(data)
+                    packet = packetManager.unpack(data, length)
                     if int(packet.ospfHeader.type) == 1:
                         if packet.ospfHeader.routerId not in interface.neighborList:
                             addr = sender[0].split('%')[0]
@@ -335,6 +352,7 @@ class Waiting:
                                 waiting = False
                 else:
                     pass
+        receiveBuffers.put(data)
 
     def run_send(self, interface):
         global waiting
@@ -439,17 +457,55 @@ class Receiver:
 
     def receiver(self, intf):
         while intf.active:
-            packet, sender = self.receiver_socket.recvfrom(5000)
-            workerThread = threading.Thread(target=self.run, args=(intf, packet, sender))
+            data = receiveBuffers.get()
+            length, sender = self.receiver_socket.recvfrom_into(data, RECEIVE_SIZE)
+            workerThread = threading.Thread(target=self.run, args=(intf, data, length, sender))
             workerThread.daemon = True
             workerThread.start()
 
-    def run(self, intf, unpackedPacket, sender):
-        if sender[0].split('%')[0] not in intf.ospfDb.addressList:
-            check, destination = packetManager.check_data(unpackedPacket, sender, intf)
-            if check and not check_sender(intf.address, sender):
-                packet = packetManager.unpack(unpackedPacket)
-                packet.process(sender, intf, intf.get_lsdb())
+    def run(self, intf, data, length, sender):
+        try:
+            if sender[0].split('%')[0] not in intf.ospfDb.addressList:
+                check, destination = packetManager.check_data(data, sender, intf, length)
+                if check and not check_sender(intf.address, sender):
+                    packet = packetManager.unpack(data, length)
+                    packet.process(sender, intf, intf.get_lsdb())
+        finally:
+            receiveBuffers.put(data)
+
+
+class BufferPool:  # receive buffers for recvfrom_into, decoded packets keep no reference to them
+    def __init__(self):
+        self.buffers = []
+        self.lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+
+    def get(self):
+        self.lock.acquire()
+        try:
+            if len(self.buffers) > 0:
+                self.reused += 1
+                return self.buffers.pop()
+            self.allocated += 1
+            return bytearray(RECEIVE_SIZE)
+        finally:
+            self.lock.release()
+
+    def put(self, data):
+        self.lock.acquire()
+        try:
+            if len(self.buffers) < POOL_SIZE:
+                self.buffers.append(data)
+        finally:
+            self.lock.release()
+
+    def print_statistics(self):
+        print 'Receive buffers: ' + str(len(self.buffers)) + ' free, ' + str(self.allocated) + ' allocated, ' + str(
+            self.reused) + ' reused'
+
+
+receiveBuffers = BufferPool()
 
 
 class SendHelloPacket:
@@ -478,6 +534,9 @@ class UpdateManager:
         self.threadnum += 1
         return out
 
+    def pending_updates(self):  # LSAs sent and not acknowledged yet
+        return sum([len(updates) for updates in self.updateList.values()])
+
     def send_unicast_update(self, address, interface, requests):  # requests = [idx1, idx2, ...]
         if interface.active and interface.hasNeighbor:
             threadnum = self.get_thread_number()
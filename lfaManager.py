@@ -0,0 +1,154 @@
+import addressManagment
+import datetime
+import fibWriter
+import spfEngine
+
+
+class LFAManager:  # per-prefix loop-free alternates, RFC 5286
+    def __init__(self, area):
+        self.areaID = area
+        self.protected = 0
+        self.unprotected = 0
+        self.status = {}  # {address: True if the route has an alternate}, routes a backup was looked for
+        self.revision = None  # graph revision the neighbor distances below were computed for
+        self.neighbors = {}  # {router: link cost}
+        self.neighborDistances = {}  # {neighbor: {node: cost}} SPF rooted at every neighbor
+        self.computed = 0  # runs that rooted an SPF at every neighbor
+        self.reused = 0  # runs that kept the distances of an unchanged graph
+
+    def get_links(self, graph, nodeList, node):  # [(node, cost),] out of node
+        out = []
+        for edge in graph.edges.get(node, ()):
+            try:
+                cost = graph.distances[(node, edge)]
+            except:
+                continue
+            edge = spfEngine.resolve_node(edge, nodeList)
+            if edge is not None:
+                out.append((edge, cost))
+        return out
+
+    def get_neighbors(self, graph, nodeList, initial):  # {router: link cost}, routers on attached networks included
+        out = {}
+        for node, cost in self.get_links(graph, nodeList, initial):
+            if node.is_network():
+                routers = [(router, cost + routerCost) for router, routerCost in self.get_links(graph, nodeList, node)
+                           if router is not initial]
+            else:
+                routers = [(node, cost)]
+            for router, routerCost in routers:
+                if router not in out or routerCost < out[router]:
+                    out[router] = routerCost
+        return out
+
+    def get_prefix_owners(self, nodes, initial, addresses=None):  # {address: [(node, prefix cost),]}
+        out = {}
+        for node in nodes:
+            if node is initial:
+                continue
+            for prefix in node.get_prefixes().values():
+                if addresses is None or prefix.address in addresses:
+                    out.setdefault(prefix.address, []).append((node, 0))
+            for prefix in node.interAreaPrefixes.values():
+                if addresses is None or prefix.address in addresses:
+                    out.setdefault(prefix.address, []).append((node, prefix.metric))
+        return out
+
+    def neighbor_distances(self, graph, nodeList, initial):  # only recomputed when the graph changed since last run
+        if self.revision != graph.revision:
+            graph = graph.snapshot()  # the SPF runs below cover the whole graph, copying it first costs no more
+            self.neighbors = self.get_neighbors(graph, nodeList, initial)
+            self.neighborDistances = graph.get_csr(nodeList).distances_from(self.neighbors.keys())
+            self.revision = graph.revision
+            self.computed += 1
+        else:
+            self.reused += 1
+        return self.neighbors, self.neighborDistances
+
+    def distance_to_prefix(self, distances, owners):
+        best = None
+        for node, cost in owners:
+            if node in distances:
+                if best is None or distances[node] + cost < best:
+                    best = distances[node] + cost
+        return best
+
+    def compute_backups(self, graph, nodeList, initial, visited, routeTable, routeManager, ospfDB, addresses=None,
+                        ownerNodes=None):  # addresses: prefixes that changed without the topology, owned by ownerNodes
+        if routeTable is None:
+            return
+        neighborDistances = {}  # {neighbor: {node: cost}} neighbors with a usable next hop
+        neighborAddresses = {}  # {neighbor: intfId}
+        neighbors, distancesFrom = self.neighbor_distances(graph, nodeList, initial)
+        for neighbor, distances in distancesFrom.items():
+            address = routeManager.get_next_hop_addresses([neighbor], ospfDB)[0]
+            if initial in distances and address is not None:
+                neighborDistances[neighbor] = distances
+                neighborAddresses[neighbor] = address
+        if addresses is None:
+            owners = self.get_prefix_owners(visited.keys(), initial)
+            routes = routeTable.routes.items()
+            self.status = {}
+        else:
+            owners = self.get_prefix_owners([node for node in ownerNodes if node in visited], initial, addresses)
+            routes = [(address, routeTable.routes[address]) for address in addresses if address in routeTable.routes]
+            for address in addresses:
+                self.status.pop(address, None)
+        for address, route in routes:
+            route.backups = []
+            if len(route.nextHops) > 1 or address not in owners:  # ECMP routes already protect themselves
+                continue
+            best = None
+            for neighbor, distances in neighborDistances.items():
+                backupAddress = neighborAddresses[neighbor]
+                if backupAddress in route.nextHops:
+                    continue
+                cost = self.distance_to_prefix(distances, owners[address])
+                if cost is None or cost >= distances[initial] + route.metric:  # Dist(N,D) < Dist(N,S) + Dist(S,D)
+                    continue
+                total = neighbors[neighbor] + cost
+                if best is None or (total, neighbor.idx) < best[:2]:
+                    best = (total, neighbor.idx, backupAddress)
+            if best is not None:
+                route.backups = [best[2]]
+            self.status[address] = best is not None
+        self.protected = len([protected for protected in self.status.values() if protected])
+        self.unprotected = len(self.status) - self.protected
+
+    def print_statistics(self):
+        print '\tloop-free alternates: ' + str(self.protected) + ' protected, ' + str(
+            self.unprotected) + ' unprotected'
+        print '\tneighbor SPF runs: ' + str(self.computed) + ' computed, ' + str(self.reused) + ' reused'
+
+    def activate_backups(self, routeTable, adjacency, adjacencies):  # local adjacency lost, reroute before SPF
+        if routeTable is None:
+            return 0
+        swapped = 0
+        transaction = addressManagment.FIBTransaction(routeTable.report_route)
+        for address, route in routeTable.routes.items():
+            if adjacency.linkLocal not in route.nextHops:
+                continue
+            remaining = [intf for intf in route.nextHops if intf != adjacency.linkLocal]
+            isNextHop = route.isNextHop
+            if len(remaining) == 0:  # no equal-cost path left, use the alternate
+                remaining = route.backups
+                isNextHop = False
+            if len(remaining) == 0:
+                continue
+            route.nextHops = remaining
+            route.intf = remaining[0]
+            route.isNextHop = isNextHop
+            route.backups = []
+            vias = route.get_adjacencies(adjacencies)
+            if len(vias) == 0:
+                continue
+            try:
+                prefix = routeTable.prefixes[address].dest
+            except:
+                prefix = routeTable.prefixes[address]
+            transaction.add_route(address, prefix.get_full_address(), vias, route.metric, route.isNextHop)
+            swapped += 1
+        fibWriter.submit(transaction)  # replaces operations still queued with the dead next hop
+        print datetime.datetime.now().strftime('%H:%M:%S.%f') + ' Area ' + str(
+            self.areaID) + ' ' + str(swapped) + ' routes switched to loop-free alternates'
+        return swapped
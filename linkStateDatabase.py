@@ -763,6 +763,8 @@ class LSA:
         self.lsid = None
         self.idx = None
         self.lsaHeader = None
+        self.encoded = None  # ((sequence number, version), whole LSA as last encoded), see encoded_lsa
+        self.version = 0  # bumped by unlock_changed_lsa, the contents only change under the LSA lock
 
         self.lsaLock = threading.Lock()
 
@@ -772,21 +774,34 @@ class LSA:
     def unlock_lsa(self):
         self.lsaLock.release()
 
+    def unlock_changed_lsa(self):  # the next send rebuilds the cached encoding
+        self.version += 1
+        self.lsaLock.release()
+
     def set_sequence_number(self, newseq):
         self.lock_lsa()
         self.sequenceNumber = newseq
         self.age = 0
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def update(self):
         self.lock_lsa()
         self.sequenceNumber += 1
         self.age = 0
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def package_lsa(self, isfull):
         self.lsaHeader = packetManager.LSAHeader(self.age, self.lsType, self.lsid, self.advRouter, self.sequenceNumber)
 
+    def encoded_lsa(self, isfull):  # package_lsa from the bytes cached until the next change, with the current age
+        key = (self.sequenceNumber, self.version)  # taken first, a change while building misses next time
+        encoded = self.encoded
+        if encoded is None or encoded[0] != key:
+            pieces, length = self.package_lsa(True)
+            encoded = (key, str(pieces[0]))
+            self.encoded = encoded
+        return packetManager.lsa_pieces(encoded[1], self.age, isfull)
+
     def print_lsa(self):
         pass
 
@@ -830,12 +845,12 @@ class RouterLSA(LSA):
             link = RouterLink(interface.interfaceOutputCost, interface.intfNumber, neighborInterfaceId, neighborRouterId, self.get_order())
         self.lock_lsa()
         self.linkCount[interface.intfNumber] = link
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def remove_interface(self, interface):
         self.lock_lsa()
         del self.linkCount[interface.intfNumber]
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def update_dr(self, interface):
         self.lock_lsa()
@@ -846,13 +861,13 @@ class RouterLSA(LSA):
         except:
             drintfId = interface.intfNumber
         link.update_dr(drintfId, drId)
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def update_interface_cost(self, interface):
         self.lock_lsa()
         link = self.linkCount[interface.intfNumber]
         link.update_metric(interface.interfaceOutputCost)
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def get_flags(self):  # output (W,V,E,B)
         if self.flags == int(0x01):
@@ -974,7 +989,7 @@ class InterAreaPrefixLSA(LSA):
     def update_metric(self, newMetric):
         self.lock_lsa()
         self.prefix.update_metric(newMetric)
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def package_lsa(self, isfull):
         LSA.package_lsa(self, isfull)
@@ -1010,18 +1025,18 @@ class IntraAreaPrefixLSA(LSA):
     def add_prefix(self, idx, prefix):
         self.lock_lsa()
         self.prefixList[idx] = prefix
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def remove_prefix(self, idx):
         self.lock_lsa()
         del self.prefixList[idx]
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def update_metric(self, idx, newMetric):
         self.lock_lsa()
         prefix = self.prefixList[idx]
         prefix.update_metric(newMetric)
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def process_delete(self, lsdb):
         if self.refLsType == ROUTER_LSA:
@@ -1107,30 +1122,30 @@ class LinkLSA(LSA):
     def update_priority(self, newPriority):
         self.lock_lsa()
         self.priority = newPriority
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def update_address(self, newAddress):
         self.lock_lsa()
         self.address = newAddress
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def add_prefix(self, idx, newPrefix):
         self.lock_lsa()
         self.prefixList[idx] = newPrefix
         self.numberPrefixes += 1
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def remove_prefix(self, idx):
         self.lock_lsa()
         del self.prefixList[idx]
         self.numberPrefixes -= 1
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def update_metric(self, idx, newMetric):
         self.lock_lsa()
         prefix = self.prefixList[idx]
         prefix.update_metric(newMetric)
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def package_lsa(self, isfull):
         LSA.package_lsa(self, isfull)
@@ -5,6 +5,12 @@ import overlayLSDB
 import interface
 import linkStateDatabase
 import addressManagment
+import netlinkMonitor
+import fibBackend
+import fibClasses
+import fibWriter
+import gracefulRestart
+import packetBenchmark
 import datetime
 
 
@@ -120,6 +126,7 @@ class OspfDb:
         return self.lsdbs[areaID]
 
     def clear_lsdb(self, areaId):
+        gracefulRestart.restart.unregister(areaId)  # the area is gone, the restart sweep stops waiting for it
         try:
             del self.lsdbs[areaId]
         except:
@@ -171,6 +178,12 @@ class OspfDb:
             print '\n\n\t' + str(destination) + '\n\n'
             return False
 
+    def set_route_status(self, destination, area, result):  # kernel answer for the last FIB transaction
+        if destination in self.localRoutingTable.keys() and self.localRoutingTable[destination].area == area:
+            route = self.localRoutingTable[destination]
+            route.installed = result == 0
+            route.error = result
+
     def update_route_cost(self, destination, cost, area):
         if self.localRoutingTable[destination].area == area:
             route = self.localRoutingTable[destination]
@@ -183,6 +196,8 @@ class Route:
         self.cost = cost
         self.area = area
         self.backup = {}  # area: cost
+        self.installed = False  # kernel accepted the route
+        self.error = 0  # errno of the last failed install
 
     def update_cost(self, newCost):
         self.cost = newCost
@@ -246,9 +261,23 @@ def show(options, ospfDb):
                 ospfDb.overlayGraph.print_graph()
             else:
                 ospfDb.overlayGraph.printGraphNodes()
+    elif options[1] == 'spf':
+        for entry in routingGraph.values():
+            entry.print_spf_statistics()
+        if ospfDb.overlayGraph is not None:
+            ospfDb.overlayGraph.print_spf_statistics()
     elif options[1] == 'routes':
         pass
         addressManagment.show_route()
+    elif options[1] == 'links':
+        netlinkMonitor.monitor.print_interfaces()
+    elif options[1] == 'buffers':
+        interface.receiveBuffers.print_statistics()
+    elif options[1] == 'fib':
+        print 'FIB backend: ' + fibBackend.get_backend().name
+        addressManagment.fib.print_fib()
+        fibWriter.writer.print_statistics()
+        gracefulRestart.restart.print_statistics()
     elif options[1] == 'nodes':
         if options[2] == 'local':
             for entry in routingGraph.values():
@@ -304,8 +333,23 @@ def list_help():
     print('Show Prefix LSAs:\n\t show prefixlsas')
     print('Show Route Table:\n\t show route')
     print('Disable interface:\n\t shutdown <intfID>')
+    print('Select SPF engine:\n\t spf <incremental|heap|legacy>')
+    print('Run SPF in a worker process pool (0 disables it):\n\t spf workers <number>')
+    print('Show SPF scheduler counters:\n\t show spf')
+    print('Show routes installed by ospf:\n\t show fib')
+    print('Show link state and addresses seen over netlink:\n\t show links')
+    print('Show receive buffer pool counters:\n\t show buffers')
+    print('Resynchronize installed routes with the kernel:\n\t fib reconcile')
+    print('Select FIB backend:\n\t fib backend <netlink|shell|memory>')
+    print('Install routes within a prefix right after host routes:\n\t fib class infrastructure <prefix/length>')
+    print('Install routes in a dedicated table, before any route is installed:\n\t fib table <number>')
+    print('Measure packet encode/decode rate:\n\t benchmark packets [count] [LSAs]')
+    print('Measure checksum verification rate:\n\t benchmark checksum [count] [bytes]')
     print('List help:\n\t help or ?')
     print('Exit:\n\t exit')
+    print('Exit keeping the installed routes for a graceful restart:\n\t restart')
+    print('Keep routes of a previous instance at startup, sweep the stale ones after SPF:\n\t fib restart <on|off>')
+    print('Graceful restart safety timeout:\n\t fib restart timeout <seconds>')
 
 
 def menu(option, ospfDb):
@@ -315,6 +359,8 @@ def menu(option, ospfDb):
         return
     elif options[0] == 'exit':
         exit()
+    elif options[0] == 'restart':
+        exit(True)
     elif options[0] == 'show':
         show(options, ospfDb)
     elif options[0] == 'set':
@@ -336,6 +382,12 @@ def menu(option, ospfDb):
         refresh_routing(options[1])
     elif options[0] == 'run':
         run_command(options[1:])
+    elif options[0] == 'spf':
+        set_spf_engine(options[1:])
+    elif options[0] == 'fib':
+        set_fib_option(options[1:])
+    elif options[0] == 'benchmark':
+        run_benchmark(options[1:])
     elif len(options) == 1:
         quick_start(options[0])
     else:
@@ -392,12 +444,66 @@ def run_command(command):
     print '\nRouter_Linux: '
 
 
+def set_spf_engine(options):
+    if len(options) == 0:
+        print('SPF engine: ' + dijkstraManager.spf_engine)
+    elif options[0] == 'workers' and len(options) == 2 and options[1].isdigit():
+        dijkstraManager.set_spf_workers(int(options[1]))
+        print('SPF workers set to ' + options[1])
+    elif dijkstraManager.set_spf_engine(options[0]):
+        print('SPF engine set to ' + options[0])
+    else:
+        print('\nInvalid SPF engine!\n')
+
+
+def run_benchmark(options):
+    if len(options) >= 1 and options[0] == 'packets' and all([option.isdigit() for option in options[1:3]]):
+        packetBenchmark.run(*[int(option) for option in options[1:3]])
+    elif len(options) >= 1 and options[0] == 'checksum' and all([option.isdigit() for option in options[1:3]]):
+        packetBenchmark.run_checksum(*[int(option) for option in options[1:3]])
+    else:
+        print('\nInvalid command!\n')
+
+
+def set_fib_option(options):
+    if len(options) == 1 and options[0] == 'reconcile':
+        addressManagment.reconcile_fib()
+    elif len(options) == 1 and options[0] == 'backend':
+        print('FIB backend: ' + fibBackend.get_backend().name)
+    elif len(options) == 2 and options[0] == 'table' and options[1].isdigit() and len(addressManagment.fib) == 0 \
+            and fibBackend.set_route_table(int(options[1])):
+        print('Routes will be installed in table ' + options[1])
+    elif len(options) == 3 and options[0] == 'class' and options[1] == 'infrastructure' and \
+            fibClasses.add_infrastructure_prefix(options[2]):
+        print('Prefixes within ' + options[2] + ' are installed right after host routes')
+    elif len(options) == 2 and options[0] == 'restart' and options[1] in ('on', 'off'):
+        gracefulRestart.restart.set_enabled(options[1] == 'on')
+        print('Graceful restart ' + options[1])
+    elif len(options) == 3 and options[0] == 'restart' and options[1] == 'timeout' and options[2].isdigit():
+        gracefulRestart.restart.timeout = float(options[2])
+        print('Graceful restart timeout set to ' + options[2] + 's')
+    elif len(options) == 2 and options[0] == 'backend' and fibBackend.set_backend(options[1]):
+        addressManagment.reconcile_fib()
+        print('FIB backend set to ' + options[1])
+    else:
+        print('\nInvalid FIB option!\n')
+
+
 def refresh_routing(area):
     global global_db
     lsdb = global_db.lsdbs[area]
     lsdb.routeManager.refresh_routing()
 
 
+def link_changed(intfId, up):  # netlink monitor notification
+    global global_db
+    print datetime.datetime.now().strftime('%H:%M:%S.%f') + ' link ' + intfId + (' up' if up else ' down')
+    if up or global_db is None or intfId not in global_db.interfaceList:
+        return
+    global_db.interfaceList[intfId].link_down()
+    shutdown_interface(intfId, global_db)
+
+
 def shutdown_interface(intfId, db):
     intf = db.interfaceList[intfId]
     del db.interfaceList[intfId]
@@ -411,16 +517,26 @@ def start_ospf(proccessId):
     print('\nOSPF protocol started!\n')
 
 
-def exit():
+def exit(keepRoutes=False):  # keepRoutes leaves the installed routes for the next instance to confirm
     global global_db
     for intf in global_db.interfaceList.values():
         intf.clear_ip_config()
-    addressManagment.clear_routing()
+    dijkstraManager.set_spf_workers(0)
+    gracefulRestart.restart.cancel()
+    if keepRoutes:
+        fibWriter.writer.flush(gracefulRestart.SETTLE_TIME)
+    fibWriter.writer.stop()
+    if not keepRoutes:
+        addressManagment.clear_routing()
     quit()
 
 
 """Main"""
 commands.getoutput('sysctl -w net.ipv6.conf.all.forwarding=1')
+addressManagment.reconcile_fib()
+gracefulRestart.restart.begin()
+netlinkMonitor.monitor.add_listener(link_changed)
+netlinkMonitor.monitor.start()
 while True:
     command = raw_input('Router_Linux: ')
     print str(datetime.datetime.now().strftime('%H:%M:%S.%f') + ' ' + command)
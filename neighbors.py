@@ -62,6 +62,7 @@ class Neighbor:
         lsas = []
         killlsas = []
         lsdb = self.ospfDb.lsdbs[self.areaId]
+        lsdb.routeManager.fast_reroute(self.neighborId)  # precomputed alternates take over until SPF converges
         wasDR = self.intf.is_dr()
         del self.intf.neighborList[self.neighborId]
         idx = self.intf.remove_adjacency(self.neighborId)
@@ -113,6 +114,11 @@ class Neighbor:
         else:
             return False
 
+    def neighbor_is_synchronized(self, lsdb):  # 2-Way is final for neighbors no adjacency is formed with
+        if self.state == state['2-Way']:
+            return True
+        return self.state == state['Full'] and len(lsdb.lsRequests.get(self.neighborId, [])) == 0
+
     def hello_received(self, intf, packet):
         if self.state == state['Attempt']:
             self.state = state['Init']
@@ -0,0 +1,193 @@
+import ctypes.util
+import errno
+import os
+import socket
+import struct
+import threading
+
+
+libc = ctypes.CDLL(ctypes.util.find_library('C'))
+
+NETLINK_ROUTE = 0
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+RTM_NEWROUTE = 24
+RTM_DELROUTE = 25
+NLM_F_REQUEST = 0x01
+NLM_F_ACK = 0x04
+NLM_F_REPLACE = 0x100
+NLM_F_CREATE = 0x400
+
+RT_TABLE_MAIN = 254
+RTPROT_OSPF = 188
+RT_SCOPE_UNIVERSE = 0
+RTN_UNICAST = 1
+
+RTA_DST = 1
+RTA_OIF = 4
+RTA_GATEWAY = 5
+RTA_PRIORITY = 6
+RTA_MULTIPATH = 9
+RTA_TABLE = 15
+
+NLMSGHDR = struct.Struct('=LHHLL')  # length, type, flags, sequence, port id
+RTMSG = struct.Struct('=BBBBBBBBI')  # family, dst len, src len, tos, table, protocol, scope, type, flags
+RTATTR = struct.Struct('=HH')  # length, type
+RTNEXTHOP = struct.Struct('=HBBi')  # length, flags, hops, ifindex
+NLMSGERR = struct.Struct('=i')
+
+MAX_BATCH_BYTES = 32768  # per write, keeps requests within the socket send buffer
+MAX_BATCH_MESSAGES = 128  # per write, every acknowledgement takes a buffer on the receive side
+
+
+class NetlinkSocket:
+    def __init__(self):
+        self.socket = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        self.socket.bind((0, 0))
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def next_sequence(self):
+        self.sequence = (self.sequence + 1) & 0xffffffff
+        return self.sequence
+
+    def transact(self, messages):  # [(type, flags, payload),] -> [errno,] in the same order
+        self.lock.acquire()
+        try:
+            results = []
+            chunk = []
+            size = 0
+            for msgType, flags, payload in messages:
+                if len(chunk) > 0 and (size + NLMSGHDR.size + len(payload) > MAX_BATCH_BYTES or
+                                       len(chunk) == MAX_BATCH_MESSAGES):
+                    results += self.send_chunk(chunk)
+                    chunk = []
+                    size = 0
+                chunk.append((msgType, flags, payload))
+                size += NLMSGHDR.size + len(payload)
+            if len(chunk) > 0:
+                results += self.send_chunk(chunk)
+            return results
+        finally:
+            self.lock.release()
+
+    def send_chunk(self, messages):  # one write, then wait for every acknowledgement
+        sequences = []
+        data = []
+        for msgType, flags, payload in messages:
+            sequence = self.next_sequence()
+            sequences.append(sequence)
+            data.append(NLMSGHDR.pack(NLMSGHDR.size + len(payload), msgType, flags | NLM_F_REQUEST | NLM_F_ACK,
+                                      sequence, 0))
+            data.append(payload)
+        self.socket.sendall(''.join(data))
+        results = {}
+        while len(results) < len(sequences):
+            reply = self.socket.recv(65536)
+            offset = 0
+            while offset + NLMSGHDR.size <= len(reply):
+                length, msgType, flags, sequence, pid = NLMSGHDR.unpack_from(reply, offset)
+                if length < NLMSGHDR.size:
+                    break
+                if msgType == NLMSG_ERROR:
+                    results[sequence] = -NLMSGERR.unpack_from(reply, offset + NLMSGHDR.size)[0]
+                offset += align(length)
+        return [results[sequence] for sequence in sequences]
+
+
+nlSocket = None
+nlFailed = False
+
+
+def get_socket():
+    global nlSocket, nlFailed
+    if nlSocket is None and not nlFailed:
+        try:
+            nlSocket = NetlinkSocket()
+        except (socket.error, AttributeError):
+            nlFailed = True
+    return nlSocket
+
+
+def available():
+    return get_socket() is not None
+
+
+def align(length):
+    return (length + 3) & ~3
+
+
+def attribute(attrType, data):
+    length = RTATTR.size + len(data)
+    return RTATTR.pack(length, attrType) + data + '\0' * (align(length) - length)
+
+
+def interface_index(intfId):
+    return libc.if_nametoindex(intfId)
+
+
+def split_prefix(prefix):
+    if '/' in prefix:
+        address, length = prefix.split('/')
+        return socket.inet_pton(socket.AF_INET6, address), int(length)
+    return socket.inet_pton(socket.AF_INET6, prefix), 128
+
+
+def route_header(length, table, protocol, routeType):  # tables above 255 only fit in RTA_TABLE
+    return RTMSG.pack(socket.AF_INET6, length, 0, 0, table if table < 256 else 0, protocol, RT_SCOPE_UNIVERSE,
+                      routeType, 0) + attribute(RTA_TABLE, struct.pack('=I', table))
+
+
+def route_payload(prefix, vias, metric, isNextHop, protocol=RTPROT_OSPF, table=RT_TABLE_MAIN):
+    # vias: [Adjacency,] more than one -> RTA_MULTIPATH
+    address, length = split_prefix(prefix)
+    payload = route_header(length, table, protocol, RTN_UNICAST)
+    payload += attribute(RTA_DST, address)
+    if metric is not None:
+        payload += attribute(RTA_PRIORITY, struct.pack('=I', int(metric)))
+    if len(vias) == 1:
+        payload += attribute(RTA_OIF, struct.pack('=i', interface_index(vias[0].intfId)))
+        if not isNextHop:
+            payload += attribute(RTA_GATEWAY, socket.inet_pton(socket.AF_INET6, vias[0].linkLocal))
+    elif len(vias) > 1:
+        nexthops = ''
+        for via in vias:
+            gateway = ''
+            if not isNextHop:
+                gateway = attribute(RTA_GATEWAY, socket.inet_pton(socket.AF_INET6, via.linkLocal))
+            nexthops += RTNEXTHOP.pack(RTNEXTHOP.size + len(gateway), 0, 0, interface_index(via.intfId)) + gateway
+        payload += attribute(RTA_MULTIPATH, nexthops)
+    return payload
+
+
+def delete_payload(prefix, dev=None, via=None, metric=None, protocol=RTPROT_OSPF, table=RT_TABLE_MAIN):
+    # the kernel only removes a route whose protocol matches, 0 would match routes we never installed
+    address, length = split_prefix(prefix)
+    payload = route_header(length, table, protocol, 0)
+    payload += attribute(RTA_DST, address)
+    if metric is not None:
+        payload += attribute(RTA_PRIORITY, struct.pack('=I', int(metric)))
+    if dev is not None:
+        payload += attribute(RTA_OIF, struct.pack('=i', interface_index(dev)))
+    if via is not None:
+        payload += attribute(RTA_GATEWAY, socket.inet_pton(socket.AF_INET6, via))
+    return payload
+
+
+def add_message(prefix, vias, metric, isNextHop, protocol=RTPROT_OSPF, table=RT_TABLE_MAIN):
+    return RTM_NEWROUTE, NLM_F_CREATE | NLM_F_REPLACE, route_payload(prefix, vias, metric, isNextHop, protocol,
+                                                                     table)
+
+
+def del_message(prefix, dev=None, via=None, metric=None, protocol=RTPROT_OSPF, table=RT_TABLE_MAIN):
+    return RTM_DELROUTE, 0, delete_payload(prefix, dev, via, metric, protocol, table)
+
+
+def transact(messages):
+    return get_socket().transact(messages)
+
+
+def error_string(code):
+    if code == 0:
+        return 'ok'
+    return os.strerror(code) if code in errno.errorcode else 'error ' + str(code)
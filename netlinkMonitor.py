@@ -0,0 +1,210 @@
+import netlinkManager
+import socket
+import struct
+import threading
+import time
+
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_GETADDR = 22
+NLM_F_DUMP = 0x300
+RTNLGRP_LINK = 1
+RTNLGRP_IPV6_IFADDR = 9
+
+IFLA_IFNAME = 3
+IFA_ADDRESS = 1
+IFF_UP = 0x1
+IFF_RUNNING = 0x40
+
+IFINFOMSG = struct.Struct('=BxHiII')  # family, type, index, flags, change
+IFADDRMSG = struct.Struct('=BBBBI')  # family, prefix length, flags, scope, index
+
+
+class InterfaceState:
+    def __init__(self, index, name):
+        self.index = index
+        self.name = name
+        self.up = False
+        self.linkLocals = []  # [address,]
+        self.prefixes = []  # [address/length,] global addresses
+
+    def print_state(self):
+        print '\t' + self.name + ' (' + str(self.index) + ') ' + ('up' if self.up else 'down') + ' ' + ', '.join(
+            self.linkLocals + self.prefixes)
+
+
+class NetlinkMonitor:  # link and IPv6 address cache kept current by kernel notifications
+    def __init__(self):
+        self.interfaces = {}  # {ifindex: InterfaceState}
+        self.names = {}  # {name: ifindex}
+        self.listeners = []  # [function(name, up),] called on every link state change
+        self.lock = threading.Lock()
+        self.socket = None
+        self.thread = None
+        self.notify = False  # the initial dump only fills the cache
+        self.events = 0
+
+    def start(self):  # False when netlink is unavailable, lookups then fall back to the callers' own methods
+        try:
+            self.socket = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, netlinkManager.NETLINK_ROUTE)
+            self.socket.bind((0, (1 << (RTNLGRP_LINK - 1)) | (1 << (RTNLGRP_IPV6_IFADDR - 1))))
+        except (socket.error, AttributeError):
+            self.socket = None
+            return False
+        self.dump(RTM_GETLINK, IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0))
+        self.dump(RTM_GETADDR, IFADDRMSG.pack(socket.AF_INET6, 0, 0, 0, 0))
+        self.notify = True
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+        return True
+
+    def running(self):
+        return self.socket is not None
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def dump(self, msgType, payload):  # initial state, notifications arriving meanwhile are handled as well
+        self.socket.sendall(netlinkManager.NLMSGHDR.pack(netlinkManager.NLMSGHDR.size + len(payload), msgType,
+                                                         netlinkManager.NLM_F_REQUEST | NLM_F_DUMP, 0, 0) + payload)
+        while not self.receive():
+            pass
+
+    def run(self):
+        resync = False
+        while True:
+            try:
+                if resync:  # ENOBUFS, notifications were lost: read the whole state again
+                    self.dump(RTM_GETLINK, IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0))
+                    self.dump(RTM_GETADDR, IFADDRMSG.pack(socket.AF_INET6, 0, 0, 0, 0))
+                    resync = False
+                else:
+                    self.receive()
+            except socket.error as e:
+                if resync:  # the dump failed as well, retried on the next pass
+                    time.sleep(1)
+                print 'Netlink monitor: ' + str(e) + ', reading the link state again'
+                resync = True
+
+    def receive(self):  # True once a dump finished
+        reply = self.socket.recv(65536)
+        done = False
+        changes = []
+        offset = 0
+        while offset + netlinkManager.NLMSGHDR.size <= len(reply):
+            length, msgType, flags, sequence, pid = netlinkManager.NLMSGHDR.unpack_from(reply, offset)
+            if length < netlinkManager.NLMSGHDR.size:
+                break
+            body = offset + netlinkManager.NLMSGHDR.size
+            if msgType == netlinkManager.NLMSG_DONE or msgType == netlinkManager.NLMSG_ERROR:
+                done = True
+            elif msgType in (RTM_NEWLINK, RTM_DELLINK):
+                change = self.link_message(msgType, reply, body, offset + length)
+                if change is not None:
+                    changes.append(change)
+            elif msgType in (RTM_NEWADDR, RTM_DELADDR):
+                self.address_message(msgType, reply, body, offset + length)
+            offset += netlinkManager.align(length)
+        for name, up in changes:
+            for listener in self.listeners if self.notify else []:
+                try:
+                    listener(name, up)
+                except Exception as e:  # the other listeners and the monitor keep running
+                    print 'Netlink monitor: link ' + name + ' listener failed: ' + str(e)
+        return done
+
+    def link_message(self, msgType, data, start, end):  # (name, up) when the link state changed
+        family, linkType, index, flags, change = IFINFOMSG.unpack_from(data, start)
+        attributes = read_attributes(data, start + IFINFOMSG.size, end)
+        self.events += 1
+        self.lock.acquire()
+        try:
+            state = self.interfaces.get(index)
+            if msgType == RTM_DELLINK:
+                if state is None:
+                    return None
+                del self.interfaces[index]
+                self.names.pop(state.name, None)
+                return (state.name, False) if state.up else None
+            name = attributes.get(IFLA_IFNAME, '').rstrip('\0')
+            if state is None:
+                state = InterfaceState(index, name)
+                self.interfaces[index] = state
+            elif name != '' and name != state.name:
+                self.names.pop(state.name, None)
+                state.name = name
+            self.names[state.name] = index
+            up = (flags & IFF_UP) != 0 and (flags & IFF_RUNNING) != 0
+            if up == state.up:
+                return None
+            state.up = up
+            return state.name, up
+        finally:
+            self.lock.release()
+
+    def address_message(self, msgType, data, start, end):
+        family, length, flags, scope, index = IFADDRMSG.unpack_from(data, start)
+        attributes = read_attributes(data, start + IFADDRMSG.size, end)
+        if family != socket.AF_INET6 or IFA_ADDRESS not in attributes:
+            return
+        address = socket.inet_ntop(socket.AF_INET6, attributes[IFA_ADDRESS])
+        self.events += 1
+        self.lock.acquire()
+        try:
+            state = self.interfaces.get(index)
+            if state is None:
+                state = InterfaceState(index, '')
+                self.interfaces[index] = state
+            if address.startswith('fe80'):
+                entries = state.linkLocals
+            else:
+                entries = state.prefixes
+                address += '/' + str(length)
+            if msgType == RTM_NEWADDR and address not in entries:
+                entries.append(address)
+            elif msgType == RTM_DELADDR and address in entries:
+                entries.remove(address)
+        finally:
+            self.lock.release()
+
+    def get_state(self, name):
+        index = self.names.get(name)
+        if index is None:
+            return None
+        return self.interfaces.get(index)
+
+    def get_index(self, name):
+        return self.names.get(name)
+
+    def get_link_local(self, name):
+        state = self.get_state(name)
+        if state is None or len(state.linkLocals) == 0:
+            return None
+        return state.linkLocals[-1]
+
+    def is_up(self, name):
+        state = self.get_state(name)
+        return state is not None and state.up
+
+    def print_interfaces(self):
+        print 'Interfaces (' + str(self.events) + ' netlink events):'
+        for index in sorted(self.interfaces.keys()):
+            self.interfaces[index].print_state()
+
+
+def read_attributes(data, offset, end):  # {type: bytes}
+    out = {}
+    while offset + netlinkManager.RTATTR.size <= end:
+        length, attrType = netlinkManager.RTATTR.unpack_from(data, offset)
+        if length < netlinkManager.RTATTR.size:
+            break
+        out[attrType] = data[offset + netlinkManager.RTATTR.size:offset + length]
+        offset += netlinkManager.align(length)
+    return out
+
+
+monitor = NetlinkMonitor()
@@ -0,0 +1,105 @@
+import array
+import binascii
+import struct
+import sys
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+WORD = struct.Struct('=H')  # 16-bit word in host order, the order the sums are taken in
+NUMPY_MIN_SIZE = 512  # bytes, below it array('H') is faster than the NumPy call overhead
+LSA_HEADER_SIZE = 20
+FLETCHER_OFFSET = 16  # checksum field of the LSA header, LS age (first 2 bytes) is not covered
+use_numpy = numpy is not None
+
+
+def word_sum(data, start=0, end=None):  # unfolded sum of the 16-bit host order words of data[start:end]
+    if end is None:
+        end = len(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    words = (end - start) / 2
+    view = buffer(data, start, words * 2)
+    if use_numpy and words * 2 >= NUMPY_MIN_SIZE:
+        total = int(numpy.frombuffer(view, numpy.uint16).sum(dtype=numpy.uint64))
+    else:
+        values = array.array('H')
+        values.fromstring(view)
+        total = sum(values)
+    if (end - start) % 2:  # odd length, padded with a zero byte
+        last = ord(data[end - 1]) if isinstance(data, str) else data[end - 1]
+        total += last if sys.byteorder == 'little' else last << 8
+    return total
+
+
+def fold(total):
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return total
+
+
+def internet_checksum(total):  # checksum field of an unfolded sum, packed as it goes on the wire
+    return WORD.pack(~fold(total) & 0xffff)
+
+
+def pieces_sum(pieces):  # sum over the concatenation of a list of strings without building it
+    total = 0
+    odd = False
+    for piece in pieces:
+        if len(piece) == 0:
+            continue
+        if odd:  # the first byte completes the word the previous piece left open
+            first = ord(piece[0]) if isinstance(piece, str) else piece[0]
+            total += first << 8 if sys.byteorder == 'little' else first
+            total += word_sum(piece, 1)
+            odd = len(piece) % 2 == 0
+        else:
+            total += word_sum(piece)
+            odd = len(piece) % 2 == 1
+    return total
+
+
+def verify(data, checksumOffset, pseudoHeaders, end=None):  # index of the matching pseudo-header, -1 if none
+    received = WORD.unpack_from(data, checksumOffset)[0]
+    total = word_sum(data, 0, end) - received  # one pass over the packet, the checksum field counts as zero
+    for i in range(len(pseudoHeaders)):
+        if ~fold(total + word_sum(pseudoHeaders[i])) & 0xffff == received:
+            return i
+    return -1
+
+
+def fletcher_sums(data, start, end):  # (c0, c1 modulo 255) of the Fletcher checksum over data[start:end]
+    if isinstance(data, memoryview):  # slicing does not copy, buffer() does not take it
+        view = data[start:end]
+    else:
+        view = buffer(data, start, end - start)
+    c0 = sum(bytearray(view))
+    # read as a base 256 number, byte k from the end weighs 256 ** k = (1 + 255) ** k = 1 + 255 * k modulo 255 ** 2
+    weighted = int(binascii.hexlify(view) or '0', 16) % 65025
+    return c0, ((weighted - c0) / 255 + c0) % 255
+
+
+def fletcher(lsa):  # checksum field of a whole LSA, whatever its checksum field holds now
+    c0, c1 = fletcher_sums(lsa, 2, len(lsa))
+    length = len(lsa) - 2
+    first, second = bytearray(buffer(lsa, FLETCHER_OFFSET, 2))
+    c0 -= first + second  # as if the checksum field were zero
+    c1 -= first * (length - FLETCHER_OFFSET + 2) + second * (length - FLETCHER_OFFSET + 1)
+    c0 %= 255
+    c1 %= 255
+    x = ((len(lsa) - FLETCHER_OFFSET - 1) * c0 - c1) % 255
+    if x <= 0:
+        x += 255
+    y = 510 - c0 - x
+    if y > 255:
+        y -= 255
+    return chr(x) + chr(y)
+
+
+def fletcher_valid(data, start, end):  # a received LSA at data[start:end] sums to zero with its checksum
+    if end - start < LSA_HEADER_SIZE or end > len(data):
+        return False
+    c0, c1 = fletcher_sums(data, start + 2, end)
+    return c0 % 255 == 0 and c1 % 255 == 0
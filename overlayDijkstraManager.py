@@ -2,6 +2,7 @@ import dijkstraManager
 import threading
 from copy import deepcopy
 import addressManagment
+import spfScheduler
 
 ospf_group_address = 'ff02::5'
 
@@ -49,6 +50,9 @@ class OverlayNode:
     def add_connection(self):
         pass
 
+    def is_network(self):
+        return False
+
 
 class OverlayDijkstraManager:
     def __init__(self, selfNode, ospfDb):
@@ -61,6 +65,7 @@ class OverlayDijkstraManager:
         self.path = {}
         self.graphPath = {}
         self.routeManager = OverlayRouteManager(ospfDb)
+        self.scheduler = spfScheduler.SPFScheduler()
 
         self.init = self.add_node(selfNode, [])
 
@@ -85,32 +90,32 @@ class OverlayDijkstraManager:
         node = self.nodes[id]
         self.graph.remove_node(node)
         del self.nodes[id]
-        self.changes = True
+        self.update_changes()
 
     def update_node_add_neighbors(self, nodeId, neighbors):
         node = self.nodes[nodeId]
         node.add_neighbors(neighbors)
-        self.changes = True
+        self.update_changes()
 
     def update_node_remove_neighbors(self, nodeId, neighbors):
         node = self.nodes[nodeId]
         node.remove_neighbors(neighbors)
-        self.changes = True
+        self.update_changes()
 
     def update_node_add_prefixes(self, nodeId, prefixes):
         node = self.nodes[nodeId]
         node.add_prefixes(prefixes)
-        self.changes = True
+        self.update_changes()
 
     def update_node_remove_prefixes(self, nodeId, prefixes):
         node = self.nodes[nodeId]
         node.remove_prefixes(prefixes)
-        self.changes = True
+        self.update_changes()
 
     def update_node_prefix_cost(self, nodeId, prefixes):
         node = self.nodes[nodeId]
         if node.update_prefix_cost(prefixes):
-            self.changes = True
+            self.update_changes()
 
     def add_edge(self, sNode, dNode, cost):
         node1 = self.nodes[sNode]
@@ -119,30 +124,26 @@ class OverlayDijkstraManager:
         except:
             node2 = self.add_node(dNode, [])
         self.graph.add_edge(node1, node2, cost)
-        self.changes = True
+        self.update_changes()
 
     def remove_edge(self, sNode, dNode):
         node1 = self.nodes[sNode]
         node2 = self.nodes[dNode]
         self.graph.remove_edge(node1, node2)
-        self.changes = True
+        self.update_changes()
 
     def update_edge_cost(self, sNode, dNode, newCost):
         node1 = self.nodes[sNode]
         node2 = self.nodes[dNode]
         if self.graph.change_cost(node1, node2, newCost):
-            self.changes = True
+            self.update_changes()
             return
         else:
             return
 
-    def next_hop(self, path, dest, init):
-        nextHop = path[dest]
-        previousHop = dest
-        while nextHop != init:
-            previousHop = nextHop
-            nextHop = path[nextHop]
-        return previousHop
+    def update_changes(self):
+        self.changes = True
+        self.scheduler.schedule()
 
     def print_edges(self):
         self.graph.print_edges()
@@ -151,24 +152,23 @@ class OverlayDijkstraManager:
         for lsdb in self.ospfDb.lsdbs.values():
             lsdb.clear_inter_area_lsas()
 
+    def print_spf_statistics(self):
+        self.scheduler.print_statistics('Overlay')
+
     def run(self, initial):
-        while self.work:
+        while self.work and self.scheduler.wait():
             if self.changes:
-                self.visited, self.path = dijkstraManager.dijsktra(self.graph, initial, self.nodes)
-                aux = {}
-                for dest in self.path.keys():
-                    aux[dest] = self.next_hop(self.path, dest, self.init)
-                    self.graphPath = self.path
-                self.path = aux
-                self.routeManager.set_remote_destinations(self.visited)
                 self.changes = False
-                threading._sleep(5)
-            else:
-                threading._sleep(5)
+                self.visited, self.graphPath, self.path = dijkstraManager.run_spf(self.graph.snapshot(), initial, self.nodes)
+                self.routeManager.set_remote_destinations(self.visited)
         self.clear_inter_area_lsas()
 
-    def __del__(self):
+    def stop(self):
         self.work = False
+        self.scheduler.stop()
+
+    def __del__(self):
+        self.stop()
 
 
 class OverlayRouteManager:
@@ -205,7 +205,7 @@ class OverlayLSDB:
         pass
 
     def kill_overlay_routemanager(self):
-        self.overlayRouteManager.work = False
+        self.overlayRouteManager.stop()
 
     def create_abrls(self):
         lsid = '0.0.0.0'
@@ -493,15 +493,15 @@ class ABRLSA(linkStateDatabase.LSA):
     def add_neighbor(self, neighbor, cost):
         self.lock_lsa()
         self.neighborList[neighbor] = cost
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def remove_neighbor(self, neighbor):
         self.lock_lsa()
         try:
             del self.neighborList[neighbor]
-            self.unlock_lsa()
+            self.unlock_changed_lsa()
         except:
-            self.unlock_lsa()
+            self.unlock_changed_lsa()
 
     def get_neighbor_list(self):
         out = None
@@ -513,7 +513,7 @@ class ABRLSA(linkStateDatabase.LSA):
     def update_neighbor_cost(self, neighbor, newCost):
         self.lock_lsa()
         self.neighborList[neighbor] = int(newCost)
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def get_neighbor_cost(self, neighbor):
         self.lock_lsa()
@@ -558,18 +558,18 @@ class PrefixLSA(linkStateDatabase.LSA):
         prefix = linkStateDatabase.Prefix(address, length, metric, options)
         self.lock_lsa()
         self.prefixes[address] = prefix
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def remove_prefix(self, address):
         self.lock_lsa()
         del self.prefixes[address]
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def update_prefix_cost(self, address, newCost):
         self.lock_lsa()
         prefix = self.prefixes[address]
         prefix.update_metric(newCost)
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def process_delete(self, db):
         node = db.routeManager.get_node(self.advRouter)
@@ -608,12 +608,12 @@ class ASBRLSA(linkStateDatabase.LSA):
     def add_neighbor(self, neighbor, cost):
         self.lock_lsa()
         self.neighborList[neighbor] = cost
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def remove_neighbor(self, neighbor):
         self.lock_lsa()
         del self.neighborList[neighbor]
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def get_neighbor_list(self):
         out = None
@@ -625,7 +625,7 @@ class ASBRLSA(linkStateDatabase.LSA):
     def update_neighbor_cost(self, neighbor, newCost):
         self.lock_lsa()
         self.neighborList[neighbor] = int(newCost)
-        self.unlock_lsa()
+        self.unlock_changed_lsa()
 
     def get_neighbor_cost(self, neighbor):
         self.lock_lsa()
@@ -0,0 +1,177 @@
+import interface
+import linkStateDatabase
+import os
+import ospfChecksum
+import packetManager
+import socket
+import struct
+import sys
+import time
+
+ROUTER_ID = '1.1.1.1'
+AREA_ID = '0.0.0.1'
+
+
+class BenchmarkInterface:  # the attributes of an active interface the packet builders read
+    def __init__(self, neighbors):
+        self.routerId = ROUTER_ID
+        self.areaId = AREA_ID
+        self.address = 'fe80::1'
+        self.intfId = 'bench0'
+        self.intfNumber = 1
+        self.routerPriority = 1
+        self.helloInterval = 10
+        self.routerDeadInterval = 40
+        self.designatedRouter = ROUTER_ID
+        self.backupDesignatedRouter = '0.0.0.0'
+        self.neighborList = {}
+        for i in range(neighbors):
+            self.neighborList['10.0.' + str(i / 256) + '.' + str(i % 256)] = None
+
+
+def router_lsas(count, links):  # router LSAs of a synthetic area, each with the given number of links
+    out = {}
+    for i in range(count):
+        advRouter = '10.1.' + str(i / 256) + '.' + str(i % 256)
+        linkCount = {}
+        for j in range(links):
+            linkCount[j] = linkStateDatabase.RouterLink(10, j, j + 1, '10.2.0.' + str(j), j)
+        lsa = linkStateDatabase.RouterLSA(advRouter, 1, linkStateDatabase.SEQUENCE_NUMBER, 0, 0, linkCount, 0x33,
+                                          '0.0.0.0')
+        out[lsa.idx] = lsa
+    return out
+
+
+def encode(intf, packetType, body):
+    ospfHeader = packetManager.OSPFHeader()
+    ospfHeader.init(packetType, ROUTER_ID, AREA_ID)
+    if packetType == 1:
+        packet = packetManager.HelloPacket(ospfHeader)
+        packetBody = packet.packet_body(intf)
+    elif packetType == 2:
+        packet = packetManager.DBDescription(ospfHeader)
+        packetBody = packet.packet_body_simple(1, 1000, 0x13)
+        for lsa in body.values():
+            packetBody += lsa.encoded_lsa(False)[0]
+    elif packetType == 4:
+        packet = packetManager.LSUpdate(ospfHeader)
+        packetBody = packet.packet_body(intf, body)
+    else:
+        packet = packetManager.LSAcknowledge(ospfHeader)
+        packetBody = packet.packet_body(body)
+    return packet.build(intf, packetManager.ospf_group_address, packetBody, packetType)
+
+
+def measure(function, count):  # calls per second
+    start = time.time()
+    for i in xrange(count):
+        function()
+    elapsed = time.time() - start
+    return count / elapsed if elapsed > 0 else float('inf')
+
+
+def run(count=2000, lsas=20, links=4):
+    intf = BenchmarkInterface(8)
+    database = router_lsas(lsas, links)
+    update = encode(intf, 4, database)
+    headers = [lsa.lsaHeader for lsa in packetManager.unpack(update[packetManager.IPV6_HEADER.size:]).updates.values()]
+    bodies = {1: None, 2: database, 4: database, 5: headers}
+    names = {1: 'Hello', 2: 'DD', 4: 'LSU', 5: 'LSAck'}
+    print 'Packet codec, ' + str(count) + ' packets per type, ' + str(lsas) + ' router LSAs with ' + str(
+        links) + ' links:'
+    for packetType in (1, 2, 4, 5):
+        body = bodies[packetType]
+        packet = encode(intf, packetType, body)[packetManager.IPV6_HEADER.size:]
+        encoded = measure(lambda: encode(intf, packetType, body), count)
+        decoded = measure(lambda: packetManager.unpack(packet), count)
+        print '\t' + names[packetType] + ' (' + str(len(packet)) + ' bytes): encode ' + str(
+            int(encoded)) + ' packets/s, decode ' + str(int(decoded)) + ' packets/s'
+    rebuilt = measure(lambda: encode(intf, 4, uncached(database)), count)
+    print '\tLSU with every LSA rebuilt: encode ' + str(int(rebuilt)) + ' packets/s'
+    received = bytearray(interface.RECEIVE_SIZE)  # as recvfrom_into leaves it
+    packet = encode(intf, 4, database)[packetManager.IPV6_HEADER.size:]
+    received[:len(packet)] = packet
+    decoded = measure(lambda: packetManager.unpack(received, len(packet)), count)
+    print '\tLSU from a receive buffer: decode ' + str(int(decoded)) + ' packets/s'
+
+
+def uncached(database):  # drops the cached encodings, as after every LSA changed
+    for lsa in database.values():
+        lsa.encoded = None
+    return database
+
+
+def legacy_checksum(packet):  # the byte at a time loop check_data and Packet.build used before ospfChecksum
+    countTo = (int(len(packet) / 2)) * 2
+    my_sum = 0
+    count = 0
+    while count < countTo:
+        if sys.byteorder == "little":
+            loByte = packet[count]
+            hiByte = packet[count + 1]
+        else:
+            loByte = packet[count + 1]
+            hiByte = packet[count]
+        my_sum += (ord(hiByte) * 256 + ord(loByte))
+        count += 2
+    if countTo < len(packet):
+        my_sum += ord(packet[len(packet) - 1])
+    my_sum &= 0xffffffff
+    my_sum = (my_sum >> 16) + (my_sum & 0xffff)
+    my_sum += (my_sum >> 16)
+    return struct.pack("!H", socket.htons(~my_sum & 0xffff))
+
+
+def legacy_check(packet, pseudoHeaders):  # one pass per candidate destination, the old check_data worst case
+    for pseudoHeader in pseudoHeaders:
+        if legacy_checksum(pseudoHeader + packet[:12] + '\x00\x00' + packet[14:]) == packet[12:14]:
+            return True
+    return False
+
+
+def legacy_fletcher(packet):  # the per-byte loop fletcher_checksum ran before ospfChecksum
+    packet = packet[:16] + '\x00\x00' + packet[18:]
+    c0 = c1 = 0
+    for char in packet[2:]:
+        c0 += ord(char)
+        c1 += c0
+    c0 %= 255
+    c1 %= 255
+    x = ((len(packet) - 16 - 1) * c0 - c1) % 255
+    if x <= 0:
+        x += 255
+    y = 510 - c0 - x
+    if y > 255:
+        y -= 255
+    return chr(x) + chr(y)
+
+
+def run_checksum(count=2000, size=1500):
+    intf = BenchmarkInterface(0)
+    body = os.urandom(size - packetManager.OSPF_HEADER.size)
+    pseudoHeaders = [packetManager.ipv6_pseudoheader('fe80::2', destination, size)[0]
+                     for destination in (intf.address, packetManager.ospf_group_address)]
+    header = bytearray(packetManager.OSPF_HEADER.pack(3, 4, size, socket.inet_aton(ROUTER_ID),
+                                                      socket.inet_aton(AREA_ID), 0, 0, 0))
+    header[12:14] = ospfChecksum.internet_checksum(ospfChecksum.word_sum(pseudoHeaders[1]) +
+                                                   ospfChecksum.pieces_sum([header, body]))
+    packet = str(header) + body  # multicast, so both candidates are tried
+    print 'Internet checksum, ' + str(count) + ' packets of ' + str(size) + ' bytes' + (
+        ', NumPy' if ospfChecksum.use_numpy else '') + ':'
+    for name, function in (('legacy', lambda: legacy_check(packet, pseudoHeaders)),
+                           ('ospfChecksum', lambda: ospfChecksum.verify(packet, 12, pseudoHeaders))):
+        rate = measure(function, count)
+        print '\t' + name + ' verify: ' + str(int(rate)) + ' packets/s, ' + str(
+            round(rate * size / 1000000.0, 2)) + ' MB/s'
+    lsa = str(router_lsas(1, (size - 24) / 16).values()[0].package_lsa(True)[0][0])
+    print 'Fletcher checksum, ' + str(count) + ' router LSAs of ' + str(len(lsa)) + ' bytes:'
+    for name, function in (('legacy', lambda: legacy_fletcher(lsa)), ('bulk', lambda: ospfChecksum.fletcher(lsa)),
+                           ('received', lambda: ospfChecksum.fletcher_valid(lsa, 0, len(lsa)))):
+        print '\t' + name + ': ' + str(int(measure(function, count))) + ' LSAs/s'
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'checksum':
+        run_checksum(*[int(argument) for argument in sys.argv[2:]])
+    else:
+        run(*[int(argument) for argument in sys.argv[1:]])
@@ -1,52 +1,75 @@
 import socket
 import struct
-import sys
 import neighbors
 import interface
 import linkStateDatabase
 import addressManagment
+import ospfChecksum
 
 ospf_group_address = 'ff02::5'
 
+""" Codecs """
+
+IPV6_HEADER = struct.Struct('!IHBB16s16s')  # version/class/flow label, payload length, next header, hop limit, src, dst
+PSEUDO_HEADER = struct.Struct('!16s16sII')  # source, destination, upper-layer length, next header
+OSPF_HEADER = struct.Struct('!BBH4s4sHBB')  # version, type, length, router ID, area ID, checksum, instance, reserved
+LSA_HEADER = struct.Struct('!HH4s4sI2sH')  # age, type, link state ID, advertising router, sequence, checksum, length
+HELLO = struct.Struct('!IBBBBHH4s4s')  # interface ID, priority, options (3 bytes), hello, dead interval, DR, BDR
+DD_HEADER = struct.Struct('!BHBHBBI')  # reserved, options (3 bytes), MTU, reserved, I/M/MS, sequence number
+LS_REQUEST = struct.Struct('!HH4s4s')  # reserved, type, link state ID, advertising router
+ROUTER_ID = struct.Struct('!4s')
+COUNT = struct.Struct('!I')
+CHECKSUM = struct.Struct('!H')
+LS_AGE = struct.Struct('!H')
+LSA_OPTIONS = struct.Struct('!BBH')  # flags or priority, reserved, options: first word of router, network and link LSAs
+ROUTER_LINK = struct.Struct('!BBHII4s')  # type, reserved, metric, interface ID, neighbor interface ID, neighbor
+INTER_AREA_PREFIX = struct.Struct('!xxHBBxx')  # metric, prefix length, prefix options
+LINK_LSA = struct.Struct('!BBH16sI')  # priority, reserved, options, link-local address, number of prefixes
+LINK_PREFIX = struct.Struct('!BBH16s')  # length, options, reserved, full address
+INTRA_AREA_PREFIX = struct.Struct('!HH4s4s')  # number of prefixes, referenced type, link state ID, advertising router
+PREFIX = struct.Struct('!BBH')  # length, options, metric, followed by the significant bytes of the address
+OVERLAY_PREFIX = struct.Struct('!BBB')  # metric, length, options, followed by the significant bytes of the address
+OVERLAY_ROUTER = struct.Struct('!B4s')  # metric, router ID
+ASBR = struct.Struct('!c4s')  # metric kept as the received byte, ASBR ID
+
+IPV6_FLOW = int(0b01101110000000000000000000000000)
+HEADERS_SIZE = IPV6_HEADER.size + OSPF_HEADER.size
+OSPF_CHECKSUM_OFFSET = IPV6_HEADER.size + 12
+LSA_CHECKSUM_OFFSET = 16
+
 """ Headers """
 
 
-def ipv6_header(pckt_length, source, sendTo):
-    IPversion_traficClass_flowLabel = struct.pack('!I', int(0b01101110000000000000000000000000))
-    payload_length = struct.pack('!H', pckt_length)
-    next_header = struct.pack('!B', 89)  # OSPF
-    hop_limit = struct.pack('!B', 1)
-    sourceAddr = socket.inet_pton(socket.AF_INET6, source)
-    destAddr = socket.inet_pton(socket.AF_INET6, sendTo)
-    return [IPversion_traficClass_flowLabel, payload_length, next_header, hop_limit, sourceAddr, destAddr]
+def ipv6_header(buffer, pckt_length, source, sendTo):
+    IPV6_HEADER.pack_into(buffer, 0, IPV6_FLOW, pckt_length, 89, 1, socket.inet_pton(socket.AF_INET6, source),
+                          socket.inet_pton(socket.AF_INET6, sendTo))  # OSPF, hop limit 1
 
 
 def ipv6_pseudoheader(source, sendTo, pckt_length):
-    sourceAddr = socket.inet_pton(socket.AF_INET6, source)
-    destAddr = socket.inet_pton(socket.AF_INET6, sendTo)
-    return [sourceAddr, destAddr, struct.pack('!H', 0) + struct.pack('!H', pckt_length),
-            struct.pack('!H', 0) + struct.pack('!H', 89)]
+    return [PSEUDO_HEADER.pack(socket.inet_pton(socket.AF_INET6, source), socket.inet_pton(socket.AF_INET6, sendTo),
+                               pckt_length, 89)]
+
+
+def ospf_header(buffer, type, pckt_length, routerID, intf):  # ospfv3, checksum 0 until the packet is complete
+    OSPF_HEADER.pack_into(buffer, IPV6_HEADER.size, 3, type, pckt_length, socket.inet_aton(routerID),
+                          socket.inet_aton(intf.areaId), 0, 0, 0)  # instance 0 for single instance ospf
+
 
+def lsa_header(buffer, lsTableEntry, linkStateID, lsType, local, u, s1):  # local=0 -> yes, local=1, no
+    LSA_HEADER.pack_into(buffer, 0, lsTableEntry.age, ls_type(u, s1, local, lsType), socket.inet_aton(linkStateID),
+                         socket.inet_aton(lsTableEntry.advRouter), lsTableEntry.sequenceNumber, '\x00\x00', len(buffer))
 
-def ospf_header(type, pckt_length, routerID, intf):
-    version = struct.pack('!B', 3)  # ospfv3
-    type = struct.pack('!B', type)  # Hello packet = 1
-    packt_length = struct.pack('!H', pckt_length)
-    rid = socket.inet_aton(routerID)
-    aid = socket.inet_aton(intf.areaId)
-    chksum = struct.pack('!H', 0)
-    instance = struct.pack('!B', 0)  # 0 for single instance ospf
-    fillerHeader = struct.pack('!B', 0)
-    return [version, type, packt_length, rid, aid, chksum, instance, fillerHeader]
 
+def lsa_finish(buffer, full):  # (pieces, length) as every LSA build returns it, with the checksum filled in
+    buffer[LSA_CHECKSUM_OFFSET:LSA_CHECKSUM_OFFSET + 2] = ospfChecksum.fletcher(buffer)  # once per encoded_lsa change
+    if full:
+        return [buffer], len(buffer)
+    return [buffer[:LSA_HEADER.size]], len(buffer)
 
-def lsa_header(lsTableEntry, linkStateID, lsType, local, u, s1):  # local=0 -> yes, local=1, no
-    lsAge = struct.pack('!H', lsTableEntry.age)
-    lsType = struct.pack('!H', ls_type(u, s1, local, lsType))
-    linkStateID = socket.inet_aton(linkStateID)
-    advertisingRouter = socket.inet_aton(lsTableEntry.advRouter)
-    sequenceNumber = struct.pack('!I', lsTableEntry.sequenceNumber)
-    return [lsAge, lsType, linkStateID, advertisingRouter, sequenceNumber]
+
+def lsa_pieces(encoded, age, full):  # (pieces, length) of a cached LSA, only LS age is new, it is not checksummed
+    end = len(encoded) if full else LSA_HEADER.size
+    return [LS_AGE.pack(age), buffer(encoded, 2, end - 2)], len(encoded)
 
 
 """ Clases """
@@ -70,13 +93,12 @@ class OSPFHeader():
         self.instanceId = 0
 
     def unpack(self, packedheader):
-        headerFormat = '!BBHIIHBB'
-        header = struct.unpack(headerFormat, packedheader)
-        self.version = int(header[0])
-        self.type = int(header[1])
+        header = OSPF_HEADER.unpack_from(packedheader)
+        self.version = header[0]
+        self.type = header[1]
         self.packetLength = str(header[2])
-        self.routerId = ip_converter(header[3])
-        self.areaId = ip_converter(header[4])
+        self.routerId = socket.inet_ntoa(header[3])
+        self.areaId = socket.inet_ntoa(header[4])
         self.checksum = str(header[5])
         self.instanceId = str(header[6])
 
@@ -86,16 +108,11 @@ class Packet():
         self.lsas = {}
         self.ospfHeader = ospfHeader
 
-    def unpack_lsa_header(self, header):
-        format = '!HHIIIHH'
-        header = struct.unpack(format, header)
-        lsage = int(header[0])
-        lstype = int(header[1])
-        linkStateID = ip_converter(header[2])
-        advertisingRouter = ip_converter(header[3])
-        sequenceNumber = int(header[4])
-        checksum = struct.pack('!H', header[5])
-        length = int(header[6])
+    def unpack_lsa_header(self, header, offset=0):
+        lsage, lstype, linkStateID, advertisingRouter, sequenceNumber, checksum, length = LSA_HEADER.unpack_from(
+            header, offset)
+        linkStateID = socket.inet_ntoa(linkStateID)
+        advertisingRouter = socket.inet_ntoa(advertisingRouter)
         lsaHeader = LSAHeader(lsage, lstype, linkStateID, advertisingRouter, sequenceNumber)
         lsaHeader.checksum = checksum
         lsaHeader.length = length
@@ -126,14 +143,13 @@ class Packet():
         pass
 
     def build(self, intf, sendTo, packetBody, packetType):
-        packetLength = load_size(packetBody) + 16
-        OSPFheader = ospf_header(packetType, packetLength, intf.routerId, intf)
-        IPv6header = ipv6_header(packetLength, intf.address, sendTo)
+        packetLength = load_size(packetBody) + OSPF_HEADER.size
+        packet = bytearray(IPV6_HEADER.size + packetLength)  # the whole datagram, every piece is copied once
+        ipv6_header(packet, packetLength, intf.address, sendTo)
+        ospf_header(packet, packetType, packetLength, intf.routerId, intf)
+        packet_builder(packet, HEADERS_SIZE, packetBody)
         IPv6PseudoHeader = ipv6_pseudoheader(intf.address, sendTo, packetLength)
-        checksum = checksum_ospf((IPv6PseudoHeader, OSPFheader, packetBody))
-        OSPFheader[5] = checksum
-        packet = [IPv6header, OSPFheader] + packetBody
-        packet = packet_builder(packet)
+        packet[OSPF_CHECKSUM_OFFSET:OSPF_CHECKSUM_OFFSET + 2] = checksum_ospf(IPv6PseudoHeader, packet)
         return packet
 
 
@@ -151,7 +167,7 @@ class LSAPacket():
     def __init__(self, lsaHeader):
         self.lsaHeader = lsaHeader
 
-    def unpack(self, packedLsa):
+    def unpack(self, packet, start, end):  # the LSA body is packet[start:end], packet is the receive memoryview
         pass
 
     def build(self, lsEntry, full):
@@ -165,51 +181,37 @@ class LSAType1(LSAPacket):
     def __init__(self, lsaHeader):
         LSAPacket.__init__(self, lsaHeader)
 
-    def unpack(self, packedLsa):
-        format = '!BBH'
-        aux = struct.unpack(format, packedLsa[:4])
-        self.flags = int(aux[0])
-        self.options = int(aux[2])
+    def unpack(self, packet, start, end):
+        aux = LSA_OPTIONS.unpack_from(packet, start)
+        self.flags = aux[0]
+        self.options = aux[2]
         self.entries = {}
         len = self.lsaHeader.length
         if len > 24:
-            entries = (len - 24) / 16
-            format = '!BBHIII'
+            entries = (len - 24) / ROUTER_LINK.size
             for i in range(0, entries):
-                start = 4 + i * 16
-                finish = start + 16
-                aux = struct.unpack(format, packedLsa[start:finish])
-                aux = RouterDescription(int(aux[0]), int(aux[1]), int(aux[2]), aux[3], aux[4], ip_converter(aux[5]), i)
+                aux = ROUTER_LINK.unpack_from(packet, start + LSA_OPTIONS.size + i * ROUTER_LINK.size)
+                aux = RouterDescription(aux[0], aux[1], aux[2], aux[3], aux[4], socket.inet_ntoa(aux[5]), i)
                 self.entries[aux.interfaceId] = aux
 
     def build(self, routerLSEntry, full):
         linkStateID = self.lsaHeader.linkStateId
         flags = routerLSEntry.get_flags()
-        flags = struct.pack('!B', buildWVEB(flags[0], flags[1], flags[2], flags[3]))
-        options = struct.pack('!BH', 0, build_lsa_options(1, 1, 1, 1))
-        LSApacket = [flags, options]
-        if len(routerLSEntry.linkCount) > 0:
-            order = {}
-            for entry in routerLSEntry.linkCount.values():
-                aux = struct.pack('!BBHII', entry.type, 0, entry.metric, entry.interfaceId,
-                                  int(entry.neighborInterfaceId))
-                aux += socket.inet_aton(entry.neighborRouterId)
-                order[entry.order] = aux
-            for value in sorted(order.keys()):
-                LSApacket.append(order[value])
-        pcktLen = 20
-        for info in LSApacket:
-            pcktLen += len(info)
-        length = struct.pack('!H', pcktLen)
+        order = {}
+        for entry in routerLSEntry.linkCount.values():
+            order[entry.order] = entry
+        links = [order[value] for value in sorted(order.keys())]
+        buffer = bytearray(LSA_HEADER.size + LSA_OPTIONS.size + len(links) * ROUTER_LINK.size)
         """LSA header"""
-        LSAheader = lsa_header(routerLSEntry, linkStateID, 1, 1, 0, 0)
-        checksum = fletcher_checksum((LSAheader, (struct.pack('!H', 0), length), LSApacket))
-        LSAheader.append(checksum)
-        LSAheader.append(length)
-        if full:
-            return LSAheader + LSApacket, pcktLen
-        else:
-            return LSAheader, pcktLen
+        lsa_header(buffer, routerLSEntry, linkStateID, 1, 1, 0, 0)
+        LSA_OPTIONS.pack_into(buffer, LSA_HEADER.size, buildWVEB(flags[0], flags[1], flags[2], flags[3]), 0,
+                              build_lsa_options(1, 1, 1, 1))
+        offset = LSA_HEADER.size + LSA_OPTIONS.size
+        for entry in links:
+            ROUTER_LINK.pack_into(buffer, offset, entry.type, 0, entry.metric, entry.interfaceId,
+                                  int(entry.neighborInterfaceId), socket.inet_aton(entry.neighborRouterId))
+            offset += ROUTER_LINK.size
+        return lsa_finish(buffer, full)
 
     def process(self, intf, dead):
         lsdb = intf.get_lsdb()
@@ -251,37 +253,27 @@ class LSAType2(LSAPacket):
     def __init__(self, lsaHeader):
         LSAPacket.__init__(self, lsaHeader)
 
-    def unpack(self, packedLsa):
-        format = '!BBH'
-        aux = struct.unpack(format, packedLsa[:4])
-        self.reserved = int(aux[0])
-        self.options = int(aux[2])
-        nbrRouter = (self.lsaHeader.length - 24) / 4
+    def unpack(self, packet, start, end):
+        aux = LSA_OPTIONS.unpack_from(packet, start)
+        self.reserved = aux[0]
+        self.options = aux[2]
+        nbrRouter = (self.lsaHeader.length - 24) / ROUTER_ID.size
         self.attachedRouters = []
-        format = '!' + nbrRouter * 'I'
-        aux = struct.unpack(format, packedLsa[4:4 + nbrRouter * 4])
-        for router in aux:
-            self.attachedRouters.append(ip_converter(router))
+        for i in range(nbrRouter):
+            router = ROUTER_ID.unpack_from(packet, start + LSA_OPTIONS.size + i * ROUTER_ID.size)[0]
+            self.attachedRouters.append(socket.inet_ntoa(router))
 
     def build(self, networkLSA, full):
         linkStateID = self.lsaHeader.linkStateId
-        options = struct.pack('!HH', 0, build_lsa_options(1, 1, 1, 1))
-        LSApacket = [options]
-        for router in networkLSA.routerList:
-            LSApacket.append(socket.inet_aton(router))
-        pcktLen = 20
-        for info in LSApacket:
-            pcktLen += len(info)
-        lenght = struct.pack('!H', pcktLen)
+        buffer = bytearray(LSA_HEADER.size + LSA_OPTIONS.size + len(networkLSA.routerList) * ROUTER_ID.size)
         """LSA header"""
-        LSAheader = lsa_header(networkLSA, linkStateID, 2, 1, 0, 0)
-        checksum = fletcher_checksum((LSAheader, (struct.pack('!H', 0), lenght), LSApacket))
-        LSAheader.append(checksum)
-        LSAheader.append(lenght)
-        if full:
-            return (LSAheader + LSApacket, pcktLen)
-        else:
-            return (LSAheader, pcktLen)
+        lsa_header(buffer, networkLSA, linkStateID, 2, 1, 0, 0)
+        LSA_OPTIONS.pack_into(buffer, LSA_HEADER.size, 0, 0, build_lsa_options(1, 1, 1, 1))
+        offset = LSA_HEADER.size + LSA_OPTIONS.size
+        for router in networkLSA.routerList:
+            ROUTER_ID.pack_into(buffer, offset, socket.inet_aton(router))
+            offset += ROUTER_ID.size
+        return lsa_finish(buffer, full)
 
     def process(self, intf, dead):
         lsdb = intf.get_lsdb()
@@ -298,47 +290,23 @@ class LSAType3(LSAPacket):
     def __init__(self, lsaHeader):
         LSAPacket.__init__(self, lsaHeader)
 
-    def unpack(self, packedLsa):
-        start = 0
-        start += 1  # padding
-        metric = struct.unpack('!BH', packedLsa[start:start + 3])[1]
-        start += 3
-        length = struct.unpack('!B', packedLsa[start:start + 1])[0]
-        start += 1
-        options = struct.unpack('!B', packedLsa[start:start + 1])[0]
-        start += 1
-        start += 2  # padding
+    def unpack(self, packet, start, end):
+        metric, length, options = INTER_AREA_PREFIX.unpack_from(packet, start)
         length /= 8
-        prefix = packedLsa[start:start + length]
-        prefix += '\x00' * (16 - length)
-        prefix = socket.inet_ntop(socket.AF_INET6, prefix)
+        prefix = prefix_address(packet, start + INTER_AREA_PREFIX.size, length)
         self.prefix = linkStateDatabase.Prefix(prefix, length * 8, metric, options)
 
     def build(self, interPrefixLSA, full):
         linkStateID = self.lsaHeader.linkStateId
-        padding = struct.pack('!B', 0)
-        LSApacket = []
         prefix = interPrefixLSA.prefix
-        metric = struct.pack('!BH', 0, prefix.metric)
         length = prefix.length
-        prefixLength = struct.pack('!B', int(length))
-        prefixOptions = struct.pack('!B', prefix.options)
-        address = socket.inet_pton(socket.AF_INET6, prefix.address)
-        address = address[:length / 8]
-        LSApacket += [padding, metric, prefixLength, prefixOptions, 2 * padding, address]
-        pcktLen = 20
-        for info in LSApacket:
-            pcktLen += len(info)
-        length = struct.pack('!H', pcktLen)
+        start = LSA_HEADER.size + INTER_AREA_PREFIX.size
+        buffer = bytearray(start + length / 8)
         """LSA header"""
-        LSAheader = lsa_header(interPrefixLSA, linkStateID, 3, 1, 0, 0)
-        checksum = fletcher_checksum((LSAheader, (struct.pack('!H', 0), length), LSApacket))
-        LSAheader.append(checksum)
-        LSAheader.append(length)
-        if full:
-            return (LSAheader + LSApacket, pcktLen)
-        else:
-            return (LSAheader, pcktLen)
+        lsa_header(buffer, interPrefixLSA, linkStateID, 3, 1, 0, 0)
+        INTER_AREA_PREFIX.pack_into(buffer, LSA_HEADER.size, prefix.metric, int(length), prefix.options)
+        buffer[start:] = socket.inet_pton(socket.AF_INET6, prefix.address)[:length / 8]
+        return lsa_finish(buffer, full)
 
     def process(self, intf, dead):
         lsdb = intf.get_lsdb()
@@ -357,55 +325,36 @@ class LSAType8(LSAPacket):
     def __init__(self, lsaHeader):
         LSAPacket.__init__(self, lsaHeader)
 
-    def unpack(self, packedLsa):
-        format = '!BBH'
-        aux = struct.unpack(format, packedLsa[:4])
-        self.routerPriority = int(aux[0])
-        self.options = int(aux[2])
-        self.linkLocalIntAddress = socket.inet_ntop(socket.AF_INET6, packedLsa[4:20])
-        prefixNbr = int(struct.unpack('!I', packedLsa[20:24])[0])
+    def unpack(self, packet, start, end):
+        priority, reserved, options, address, prefixNbr = LINK_LSA.unpack_from(packet, start)
+        self.routerPriority = priority
+        self.options = options
+        self.linkLocalIntAddress = socket.inet_ntop(socket.AF_INET6, address)
         self.numPrefixes = prefixNbr
         if self.numPrefixes != 0:
             prefixList = {}
             for i in range(0, prefixNbr):
-                metric = int(struct.unpack('!H', packedLsa[26 + i * 20:28 + i * 20])[0])
-                length = int(struct.unpack('!B', packedLsa[24 + i * 20:25 + i * 20])[0])
-                options = int(struct.unpack('!B', packedLsa[25 + i * 20:26 + i * 20])[0])
-                finish = length / 8
-                start = 28 + 20 * i
-                address = packedLsa[start:start + finish]
-                while len(address) < 16:
-                    address += '\x00'
-                address = socket.inet_ntop(socket.AF_INET6, address)
+                length, options, metric, address = LINK_PREFIX.unpack_from(packet, start + LINK_LSA.size +
+                                                                           i * LINK_PREFIX.size)
+                address = prefix_address(address, 0, length / 8)
                 prefix = linkStateDatabase.Prefix(address, length, metric, options)
                 prefixList[prefix.address] = prefix
             self.prefixList = prefixList
 
     def build(self, linkLS, full):
         linkStateID = self.lsaHeader.linkStateId
-        routerPriority = struct.pack('!B', linkLS.priority)
-        options = struct.pack('!BH', 0, build_lsa_options(1, 1, 1, 1))
-        linkLocalAddress = socket.inet_pton(socket.AF_INET6, linkLS.address)
-        prefixNbr = struct.pack('!I', linkLS.numberPrefixes)
-        LSApacket = [routerPriority, options, linkLocalAddress, prefixNbr]
-        for prefix in linkLS.prefixList.values():
-            LSApacket.append(struct.pack('!B', int(prefix.length)))
-            LSApacket.append(struct.pack('!B', int(prefix.options)))
-            LSApacket.append(struct.pack('!H', 0))
-            LSApacket.append(socket.inet_pton(socket.AF_INET6, prefix.address))
-        pcktLen = 20
-        for info in LSApacket:
-            pcktLen += len(info)
-        length = struct.pack('!H', pcktLen)
+        prefixes = linkLS.prefixList.values()
+        buffer = bytearray(LSA_HEADER.size + LINK_LSA.size + len(prefixes) * LINK_PREFIX.size)
         """LSA header"""
-        LSAheader = lsa_header(linkLS, linkStateID, 8, 0, 0, 0)
-        checksum = fletcher_checksum((LSAheader, (struct.pack('!H', 0), length), LSApacket))
-        LSAheader.append(checksum)
-        LSAheader.append(length)
-        if full:
-            return LSAheader + LSApacket, pcktLen
-        else:
-            return LSAheader, pcktLen
+        lsa_header(buffer, linkLS, linkStateID, 8, 0, 0, 0)
+        LINK_LSA.pack_into(buffer, LSA_HEADER.size, linkLS.priority, 0, build_lsa_options(1, 1, 1, 1),
+                           socket.inet_pton(socket.AF_INET6, linkLS.address), linkLS.numberPrefixes)
+        offset = LSA_HEADER.size + LINK_LSA.size
+        for prefix in prefixes:
+            LINK_PREFIX.pack_into(buffer, offset, int(prefix.length), int(prefix.options), 0,
+                                  socket.inet_pton(socket.AF_INET6, prefix.address))
+            offset += LINK_PREFIX.size
+        return lsa_finish(buffer, full)
 
     def process(self, intf, dead):
         LSAPacket.process(self, intf, dead)
@@ -428,59 +377,41 @@ class LSAType9(LSAPacket):
     def __init__(self, lsaHeader):
         LSAPacket.__init__(self, lsaHeader)
 
-    def unpack(self, packedLsa):
-        prefixNbr = int(struct.unpack('!H', packedLsa[:2])[0])
-        format = '!HII'
-        aux = struct.unpack(format, packedLsa[2:12])
+    def unpack(self, packet, start, end):
+        prefixNbr, refLsType, refLsId, refAdvRouter = INTRA_AREA_PREFIX.unpack_from(packet, start)
         self.numPrefixes = prefixNbr
-        self.refLsType = aux[0]
-        self.refLsId = ip_converter(aux[1])
-        self.refAdvRouter = ip_converter(aux[2])
+        self.refLsType = refLsType
+        self.refLsId = socket.inet_ntoa(refLsId)
+        self.refAdvRouter = socket.inet_ntoa(refAdvRouter)
         prefixList = {}
         for i in range(0, prefixNbr):
-            metric = int(struct.unpack('!H', packedLsa[14 + i * 20:16 + i * 20])[0])
-            length = int(struct.unpack('!B', packedLsa[12 + i * 20:13 + i * 20])[0])
-            options = int(struct.unpack('!B', packedLsa[13 + i * 20:14 + i * 20])[0])
-            finish = length / 8
-            start = 16 + 20 * i
-            address = packedLsa[start:start + finish]
-            while len(address) < 16:
-                address += '\x00'
-            address = socket.inet_ntop(socket.AF_INET6, address)
+            offset = start + INTRA_AREA_PREFIX.size + 20 * i
+            length, options, metric = PREFIX.unpack_from(packet, offset)
+            address = prefix_address(packet, offset + PREFIX.size, length / 8)
             prefix = linkStateDatabase.Prefix(address, length, metric, options)
             prefixList[prefix.address] = prefix
         self.prefixList = prefixList
 
     def build(self, intraLS, full):
         linkStateID = self.lsaHeader.linkStateId
-        nbrPrefixes = struct.pack('!H', len(intraLS.prefixList))
-        refLStype = struct.pack('!H', intraLS.refLsType)
-        refLSID = socket.inet_aton(intraLS.refLsId)
-        refAdvRouter = socket.inet_aton(intraLS.refAdvRouter)
-        LSApacket = [nbrPrefixes, refLStype, refLSID, refAdvRouter]
-        for prefix in intraLS.prefixList.values():
-            length = int(prefix.length)
-            LSApacket.append(struct.pack('!B', length))
-            if prefix.options is None:
-                LSApacket.append(struct.pack('!B', 0))
-            else:
-                LSApacket.append(struct.pack('!B', prefix.options))
-            LSApacket.append(struct.pack('!H', prefix.metric))
-            addr = socket.inet_pton(socket.AF_INET6, prefix.address)
-            LSApacket.append(addr[:length / 8])
-        pcktLen = 20
-        for info in LSApacket:
-            pcktLen += len(info)
-        length = struct.pack('!H', pcktLen)
+        prefixes = intraLS.prefixList.values()
+        size = LSA_HEADER.size + INTRA_AREA_PREFIX.size
+        for prefix in prefixes:
+            size += PREFIX.size + int(prefix.length) / 8
+        buffer = bytearray(size)
         """LSA header"""
-        LSAheader = lsa_header(intraLS, linkStateID, 9, 1, 0, 0)
-        checksum = fletcher_checksum((LSAheader, (struct.pack('!H', 0), length), LSApacket))
-        LSAheader.append(checksum)
-        LSAheader.append(length)
-        if full:
-            return LSAheader + LSApacket, pcktLen
-        else:
-            return LSAheader, pcktLen
+        lsa_header(buffer, intraLS, linkStateID, 9, 1, 0, 0)
+        INTRA_AREA_PREFIX.pack_into(buffer, LSA_HEADER.size, len(prefixes), intraLS.refLsType,
+                                    socket.inet_aton(intraLS.refLsId), socket.inet_aton(intraLS.refAdvRouter))
+        offset = LSA_HEADER.size + INTRA_AREA_PREFIX.size
+        for prefix in prefixes:
+            length = int(prefix.length)
+            options = 0 if prefix.options is None else prefix.options
+            PREFIX.pack_into(buffer, offset, length, options, prefix.metric)
+            offset += PREFIX.size
+            buffer[offset:offset + length / 8] = socket.inet_pton(socket.AF_INET6, prefix.address)[:length / 8]
+            offset += length / 8
+        return lsa_finish(buffer, full)
 
     def process(self, intf, dead):
         lsdb = intf.get_lsdb()
@@ -499,15 +430,12 @@ class LSAType10(LSAPacket):
     def __init__(self, lsaHeader):
         LSAPacket.__init__(self, lsaHeader)
 
-    def unpack(self, packedLsa):
-        prefixNbr = int(len(packedLsa) / 5)
+    def unpack(self, packet, start, end):
+        prefixNbr = int((end - start) / OVERLAY_ROUTER.size)
         neighborList = {}
-        start = 0
         for i in range(prefixNbr):
-            metric = struct.unpack('!B', packedLsa[start:start + 1])[0]
-            start += 1
-            rid = socket.inet_ntoa(packedLsa[start:start + 4])
-            start += 4
+            metric, rid = OVERLAY_ROUTER.unpack_from(packet, start + i * OVERLAY_ROUTER.size)
+            rid = socket.inet_ntoa(rid)
             check = rid.split('.')
             if not (check[0] == check[1] and check[0] == check[2] and check[0] == check[3]):
                 continue
@@ -516,20 +444,14 @@ class LSAType10(LSAPacket):
 
     def build(self, unknownLS, full):
         linkStateID = self.lsaHeader.linkStateId
-        packet = []
-        for neighbor in unknownLS.get_neighbor_list().keys():
-            packet.append(struct.pack('!B', unknownLS.neighborList[neighbor]))
-            packet.append(socket.inet_aton(neighbor))
-        pcktLen = len(unknownLS.neighborList) * (1 + 4) + 20
-        length = struct.pack('!H', pcktLen)
-        LSAheader = lsa_header(unknownLS, linkStateID, 10, 0, 1, 1)
-        checksum = fletcher_checksum((LSAheader, (struct.pack('!H', 0), length), packet))
-        LSAheader.append(checksum)
-        LSAheader.append(length)
-        if full:
-            return (LSAheader + packet, pcktLen)
-        else:
-            return (LSAheader, pcktLen)
+        neighbors = unknownLS.neighborList.keys()  # no lock, it would count as a change of the LSA being encoded
+        buffer = bytearray(LSA_HEADER.size + len(neighbors) * OVERLAY_ROUTER.size)
+        lsa_header(buffer, unknownLS, linkStateID, 10, 0, 1, 1)
+        offset = LSA_HEADER.size
+        for neighbor in neighbors:
+            OVERLAY_ROUTER.pack_into(buffer, offset, unknownLS.neighborList[neighbor], socket.inet_aton(neighbor))
+            offset += OVERLAY_ROUTER.size
+        return lsa_finish(buffer, full)
 
     def process(self, intf, dead):
         overlay = intf.ospfDb.overlayLsdb
@@ -545,21 +467,13 @@ class LSAType11(LSAPacket):
     def __init__(self, lsaHeader):
         LSAPacket.__init__(self, lsaHeader)
 
-    def unpack(self, packedLsa):
-        start = 0
-        max = len(packedLsa)
+    def unpack(self, packet, start, end):
         prefixList = {}
-        while start < max:
-            metric = int(struct.unpack('!B', packedLsa[start:start + 1])[0])
-            start += 1
-            length = int(struct.unpack('!B', packedLsa[start:start + 1])[0])
-            start += 1
-            options = int(struct.unpack('!B', packedLsa[start:start + 1])[0])
-            start += 1
+        while start < end:
+            metric, length, options = OVERLAY_PREFIX.unpack_from(packet, start)
+            start += OVERLAY_PREFIX.size
             length /= 8
-            prefix = packedLsa[start:start + length]
-            prefix += '\x00' * (16 - length)
-            address = socket.inet_ntop(socket.AF_INET6, prefix)
+            address = prefix_address(packet, start, length)
             start += length
             prefix = linkStateDatabase.Prefix(address, length*8, metric, options)
             prefixList[address] = prefix
@@ -567,31 +481,24 @@ class LSAType11(LSAPacket):
 
     def build(self, unknownLS, full):
         linkStateID = self.lsaHeader.linkStateId
-        packet = []
-        for prefix in unknownLS.prefixes.values():
+        prefixes = unknownLS.prefixes.values()
+        size = LSA_HEADER.size
+        for prefix in prefixes:
+            size += OVERLAY_PREFIX.size + int(prefix.length) / 8
+        buffer = bytearray(size)
+        lsa_header(buffer, unknownLS, linkStateID, 11, 0, 1, 1)
+        offset = LSA_HEADER.size
+        for prefix in prefixes:
             length = int(prefix.length)
-            packet.append(struct.pack('!B', prefix.metric))
-            packet.append(struct.pack('!B', length))
             if prefix.options == 'none':
                 options = 0
             else:
                 options = int(prefix.options)
-            packet.append(struct.pack('!B', options))
-            addr = socket.inet_pton(socket.AF_INET6, prefix.address)
-            packet.append(addr[:length / 8])
-        pcktLen = 0
-        for section in packet:
-            pcktLen += len(section)
-        pcktLen += 20
-        length = struct.pack('!H', pcktLen)
-        LSAheader = lsa_header(unknownLS, linkStateID, 11, 0, 1, 1)
-        checksum = fletcher_checksum((LSAheader, (struct.pack('!H', 0), length), packet))
-        LSAheader.append(checksum)
-        LSAheader.append(length)
-        if full:
-            return LSAheader + packet, pcktLen
-        else:
-            return LSAheader, pcktLen
+            OVERLAY_PREFIX.pack_into(buffer, offset, prefix.metric, length, options)
+            offset += OVERLAY_PREFIX.size
+            buffer[offset:offset + length / 8] = socket.inet_pton(socket.AF_INET6, prefix.address)[:length / 8]
+            offset += length / 8
+        return lsa_finish(buffer, full)
 
     def process(self, intf, dead):
         overlay = intf.ospfDb.overlayLsdb
@@ -607,34 +514,23 @@ class LSAType12(LSAPacket):
     def __init__(self, lsaHeader):
         LSAPacket.__init__(self, lsaHeader)
 
-    def unpack(self, packedLsa):
-        prefixNbr = int(len(packedLsa) / 5)
+    def unpack(self, packet, start, end):
+        prefixNbr = int((end - start) / ASBR.size)
         asbrs = {}
-        start = 0
         for i in range(prefixNbr):
-            metric = packedLsa[start:start + 1]
-            start += 1
-            asbr = socket.inet_ntoa(packedLsa[start:start + 4])
-            start += 4
-            asbrs[asbr] = metric
+            metric, asbr = ASBR.unpack_from(packet, start + i * ASBR.size)
+            asbrs[socket.inet_ntoa(asbr)] = metric
         self.asbrs = asbrs
 
     def build(self, unknownLS, full):
         linkStateID = self.lsaHeader.linkStateId
-        packet = []
+        buffer = bytearray(LSA_HEADER.size + len(unknownLS.asbrs) * OVERLAY_ROUTER.size)
+        lsa_header(buffer, unknownLS, linkStateID, 12, 0, 1, 1)
+        offset = LSA_HEADER.size
         for asbr in unknownLS.asbrs:
-            packet.append(struct.pack('!B', unknownLS.asbrs[asbr]))
-            packet.append(socket.inet_aton(asbr))
-        pcktLen = len(unknownLS.asbrs) * (1 + 4) + 20
-        length = struct.pack('!H', pcktLen)
-        LSAheader = lsa_header(unknownLS, linkStateID, 12, 0, 1, 1)
-        checksum = fletcher_checksum((LSAheader, (struct.pack('!H', 0), length), packet))
-        LSAheader.append(checksum)
-        LSAheader.append(length)
-        if full:
-            return (LSAheader + packet, pcktLen)
-        else:
-            return (LSAheader, pcktLen)
+            OVERLAY_ROUTER.pack_into(buffer, offset, unknownLS.asbrs[asbr], socket.inet_aton(asbr))
+            offset += OVERLAY_ROUTER.size
+        return lsa_finish(buffer, full)
 
     def process(self, intf, dead):
         overlay = intf.ospfDb.overlayLsdb
@@ -651,23 +547,19 @@ class HelloPacket(Packet):
         Packet.__init__(self, ospfHeader)
 
     def unpack(self, packet):
-        length = len(packet)
-        format = "!IBBBBHHII"
-        neighbors = (length - 20) // 4
-        format += neighbors * "I"
-
-        msg = struct.unpack(format, packet)
+        neighbors = (len(packet) - HELLO.size) // ROUTER_ID.size
+        msg = HELLO.unpack_from(packet)
 
         self.interfaceId = str(msg[0])
         self.routerPriority = str(msg[1])
         self.options = str(msg[2]) + str(msg[3]) + str(msg[4])
         self.helloInterval = str(msg[5])
         self.routerDeadInterval = str(msg[6])
-        self.designatedRouter = ip_converter(msg[7])
-        self.backupDesignatedRouter = ip_converter(msg[8])
+        self.designatedRouter = socket.inet_ntoa(msg[7])
+        self.backupDesignatedRouter = socket.inet_ntoa(msg[8])
         self.neighbors = []
         for i in range(0, neighbors):
-            self.neighbors.append(ip_converter(msg[9 + i]))
+            self.neighbors.append(socket.inet_ntoa(ROUTER_ID.unpack_from(packet, HELLO.size + i * ROUTER_ID.size)[0]))
 
     def process(self, sender, intf, lsdb):
         if self.ospfHeader.routerId not in intf.neighborList:
@@ -694,17 +586,16 @@ class HelloPacket(Packet):
 
     def packet_body(self, intf):
         options = int(0b0010011)
-        interfaceID = socket.inet_aton('0.0.0.' + str(intf.intfNumber))
-        routerPri = struct.pack('!B', intf.routerPriority)
-        options = struct.pack('!H', 0) + struct.pack('!B', options)
-        helloInt = struct.pack('!H', intf.helloInterval)
-        deadInterval = struct.pack('!H', intf.routerDeadInterval)
-        dRouter = socket.inet_aton(intf.designatedRouter)
-        bdRouter = socket.inet_aton(intf.backupDesignatedRouter)
-        out = [interfaceID, routerPri, options, helloInt, deadInterval, dRouter, bdRouter]
-        for neighbor in intf.neighborList.keys():
-            out.append(socket.inet_aton(neighbor))
-        return out
+        neighbors = intf.neighborList.keys()
+        buffer = bytearray(HELLO.size + len(neighbors) * ROUTER_ID.size)
+        HELLO.pack_into(buffer, 0, int(intf.intfNumber), intf.routerPriority, 0, 0, options, intf.helloInterval,
+                        intf.routerDeadInterval, socket.inet_aton(intf.designatedRouter),
+                        socket.inet_aton(intf.backupDesignatedRouter))
+        offset = HELLO.size
+        for neighbor in neighbors:
+            ROUTER_ID.pack_into(buffer, offset, socket.inet_aton(neighbor))
+            offset += ROUTER_ID.size
+        return [buffer]
 
 
 class DBDescription(Packet):
@@ -712,19 +603,16 @@ class DBDescription(Packet):
         Packet.__init__(self, ospfHeader)
 
     def unpack(self, packet):
-        format = '!BHBHBBI'
-        aux = struct.unpack(format, packet[:12])
+        aux = DD_HEADER.unpack_from(packet)
         self.options = str(aux[2])
         self.interfaceMtu = str(aux[3])
         self.ims = unpack_ims(aux[5])
-        self.ddSequence = int(aux[6])
+        self.ddSequence = aux[6]
         pktLen = len(packet)
-        if pktLen > 12:  # has LSAs
-            lsaNbr = (pktLen - 12) / 20
+        if pktLen > DD_HEADER.size:  # has LSAs
+            lsaNbr = (pktLen - DD_HEADER.size) / LSA_HEADER.size
             for i in range(0, lsaNbr):
-                start = 12 + 20 * i
-                finish = 12 + 20 * (i + 1)
-                self.unpack_lsa_header(packet[start:finish])
+                self.unpack_lsa_header(packet, DD_HEADER.size + LSA_HEADER.size * i)
 
     def process(self, sender, intf, lsdb):
         neighbor = intf.neighborList[self.ospfHeader.routerId]
@@ -736,14 +624,7 @@ class DBDescription(Packet):
         return packet
 
     def packet_body_simple(self, ims, ddSeq, options):
-        filler = struct.pack('!B', 0)
-        options = struct.pack('!H', 0) + struct.pack('!B', options)
-        interfaceMTU = struct.pack('!H', 1500)
-        # filler 8 bytes
-        IMS = struct.pack('!B', ims)
-        ddSeq = struct.pack('!I', ddSeq)
-        out = [filler, options, interfaceMTU, filler, IMS, ddSeq]
-        return out
+        return [DD_HEADER.pack(0, 0, options, 1500, 0, ims, ddSeq)]  # MTU 1500
 
     def packet_body(self, ddseq, ack, intf, neighbor, ims):
         lsdb = intf.get_lsdb()
@@ -767,14 +648,14 @@ class DBDescription(Packet):
                     if key == linkStateDatabase.LINK_LSA:
                         if lsa.interface != intf.intfId:
                             continue
-                    pckt, pckLen = lsa.package_lsa(False)
+                    pckt, pckLen = lsa.encoded_lsa(False)
                     LSAs += pckt
                     packetLength += pckLen
             dbs = intf.ospfDb.overlayLsdb.get_dbs()
             for key in dbs.keys():
                 db = dbs[key]
                 for lsa in db.values():
-                    pckt, pckLen = lsa.package_lsa(False)
+                    pckt, pckLen = lsa.encoded_lsa(False)
                     LSAs += pckt
                     packetLength += pckLen
 
@@ -789,13 +670,10 @@ class LSRequest(Packet):
         self.requests = []
 
     def unpack(self, packet):
-        format = '!HHII'
-        reqNbr = len(packet) / 12  # 12 = LS Request size
+        reqNbr = len(packet) / LS_REQUEST.size
         for i in range(0, reqNbr):
-            start = i * 12
-            finish = (i + 1) * 12
-            aux = struct.unpack(format, packet[start:finish])
-            req = Request(int(aux[0]), int(aux[1]), ip_converter(aux[2]), ip_converter(aux[3]))
+            aux = LS_REQUEST.unpack_from(packet, i * LS_REQUEST.size)
+            req = Request(aux[0], aux[1], socket.inet_ntoa(aux[2]), socket.inet_ntoa(aux[3]))
             self.requests.append(req)
 
     def process(self, sender, intf, lsdb):
@@ -824,11 +702,7 @@ class LSRequest(Packet):
 
     def ls_request(self, request):
         lsType, advRouter, lsid = request.split('-')
-        reserved = struct.pack('!H', 0)
-        lsType = struct.pack('!H', int(lsType))
-        lsid = socket.inet_aton(lsid)
-        advRouter = socket.inet_aton(advRouter)
-        return [reserved, lsType, lsid, advRouter]
+        return [LS_REQUEST.pack(0, int(lsType), socket.inet_aton(lsid), socket.inet_aton(advRouter))]
 
 
 class Request():
@@ -846,14 +720,21 @@ class LSUpdate(Packet):
         self.updates = {}
 
     def unpack(self, packet):
-        nbrUpdates = int(struct.unpack('!I', packet[:4])[0])
-        start = 4
+        nbrUpdates = COUNT.unpack_from(packet)[0]
+        start = COUNT.size
         for i in range(0, nbrUpdates):
-            lsa = self.unpack_lsa_header(packet[start:start + 20])
-            lsaLength = int(lsa.lsaHeader.length)
-            lsaStart = start + 20
-            lsaFinish = lsaStart + (lsaLength - 20)
-            lsa.unpack(packet[lsaStart:lsaFinish])
+            lsa = self.unpack_lsa_header(packet, start)
+            lsaLength = lsa.lsaHeader.length
+            lsaStart = start + LSA_HEADER.size
+            lsaFinish = lsaStart + (lsaLength - LSA_HEADER.size)
+            if not ospfChecksum.fletcher_valid(packet, start, start + lsaLength):  # dropped, so never acknowledged
+                print '\nInvalid LSA checksum: ' + str(lsa.lsaHeader.idx)
+                del self.lsas[lsa.lsaHeader.idx]
+                if lsaLength < LSA_HEADER.size:
+                    break
+                start += lsaLength
+                continue
+            lsa.unpack(packet, lsaStart, lsaFinish)
             self.updates[lsa.lsaHeader.idx] = lsa
             start += lsaLength
 
@@ -863,38 +744,10 @@ class LSUpdate(Packet):
         return packet
 
     def packet_body(self, intf, updates):
-        lsaNumbr = struct.pack('!I', len(updates))
+        lsaNumbr = COUNT.pack(len(updates))
         LSAs = []
-        for update in updates.values():
-            lsa = None
-            lsaEntry = update
-            try:
-                lsaHeader = LSAHeader(lsaEntry.lsaHeader.lsAge, lsaEntry.lsaHeader.lsType,
-                                      lsaEntry.lsaHeader.linkStateId, lsaEntry.lsaHeader.advertisingRouter,
-                                      lsaEntry.lsaHeader.sequenceNumber)
-                lsType = lsaHeader.lsType
-            except:
-                lsaHeader = LSAHeader(lsaEntry.age, lsaEntry.lsType, lsaEntry.lsid, lsaEntry.advRouter,
-                                      lsaEntry.sequenceNumber)
-                lsType = lsaEntry.lsType
-            if lsType == int(0x2001) or lsType == 1:
-                lsa = LSAType1(lsaHeader)
-            elif lsType == int(0x2002) or lsType == 2:
-                lsa = LSAType2(lsaHeader)
-            elif lsType == int(0x2003) or lsType == 3:
-                lsa = LSAType3(lsaHeader)
-            elif lsType == int(0x2008) or lsType == 8:
-                lsa = LSAType8(lsaHeader)
-            elif lsType == int(0x2009) or lsType == 9:
-                lsa = LSAType9(lsaHeader)
-            elif lsType == int(0x400a):
-                lsa = LSAType10(lsaHeader)
-            elif lsType == int(0x400b):
-                lsa = LSAType11(lsaHeader)
-            elif lsType == int(0x400c):
-                lsa = LSAType12(lsaHeader)
-            out = lsa.build(lsaEntry, True)
-            LSAs += out[0]
+        for update in updates.values():  # stored LSAs, the same bytes go out on every interface and retransmission
+            LSAs += update.encoded_lsa(True)[0]
         packet = [lsaNumbr] + LSAs
         return packet
 
@@ -987,11 +840,9 @@ class LSAcknowledge(Packet):
         self.lsas = {}
 
     def unpack(self, packet):
-        lsaNbr = len(packet) / 20
+        lsaNbr = len(packet) / LSA_HEADER.size
         for i in range(0, lsaNbr):
-            start = i * 20
-            finish = start + 20
-            lsa = self.unpack_lsa_header(packet[start:finish])
+            lsa = self.unpack_lsa_header(packet, i * LSA_HEADER.size)
             self.lsas[lsa.lsaHeader.idx] = lsa
 
     def build(self, intf, sendTo, packetBody, packetType):
@@ -1000,17 +851,14 @@ class LSAcknowledge(Packet):
         return packet
 
     def packet_body(self, lsas):
-        lsaheaders = []
+        buffer = bytearray(len(lsas) * LSA_HEADER.size)
+        offset = 0
         for header in lsas:
-            lsAge = struct.pack('!H', header.lsAge)
-            lsType = struct.pack('!H', header.lsType)
-            linkStateID = socket.inet_aton(header.linkStateId)
-            advertisingRouter = socket.inet_aton(header.advertisingRouter)
-            sequenceNumber = struct.pack('!I', header.sequenceNumber)
-            checksum = header.checksum
-            lsaLength = struct.pack('!H', header.length)
-            lsaheaders += [lsAge, lsType, linkStateID, advertisingRouter, sequenceNumber, checksum, lsaLength]
-        return lsaheaders
+            LSA_HEADER.pack_into(buffer, offset, header.lsAge, header.lsType, socket.inet_aton(header.linkStateId),
+                                 socket.inet_aton(header.advertisingRouter), header.sequenceNumber, header.checksum,
+                                 header.length)
+            offset += LSA_HEADER.size
+        return [buffer]
 
     def process(self, sender, intf, lsdb):
         for lsaheader in self.lsas.values():
@@ -1022,9 +870,12 @@ class LSAcknowledge(Packet):
                 del lsdb.deadLSAs[idx]
 
 
-def unpack(unpacked_packet):
+def unpack(unpacked_packet, length=None):  # length: bytes received when unpacked_packet is a larger receive buffer
+    view = memoryview(unpacked_packet)  # every decoder reads through it with offsets, no part of the packet is copied
+    if length is not None:
+        view = view[:length]
     ospfHeader = OSPFHeader()
-    ospfHeader.unpack(unpacked_packet[:16])
+    ospfHeader.unpack(view)
     type = ospfHeader.type
     if type == 1:
         packet = HelloPacket(ospfHeader)
@@ -1039,7 +890,7 @@ def unpack(unpacked_packet):
     else:
         print '\nUnknown packet type'
         return 0
-    packet.unpack(unpacked_packet[16:])
+    packet.unpack(view[OSPF_HEADER.size:])
     return packet
 
 
@@ -1072,71 +923,21 @@ def ls_id(uid):
     return uid.split('-')[2]
 
 
-def check_data(msg, sender, intf):
+def check_data(msg, sender, intf, received=None):  # the unicast and multicast destinations are checked in one pass
     sender = sender[0].split('%')[0]
-    destination = intf.address
-    headerFormat = '!BBHIIHBB'
-    header = struct.unpack(headerFormat, msg[:16])
-    checksum = struct.pack('!H', header[5])
-    length = int(header[2])
-    ipv6pHeader = ipv6_pseudoheader(sender, destination, length)
-    header = pack(headerFormat, header)
-    verifiedChecksum = checksum_ospf([ipv6pHeader, header, [msg[16:]]])
-    out = (checksum == verifiedChecksum)
-    if not out:
-        ipv6pHeader = ipv6_pseudoheader(sender, 'ff02::5', length)
-        verifiedChecksum = checksum_ospf([ipv6pHeader, header, [msg[16:]]])
-        destination = 'ff02::5'
-        out = (checksum == verifiedChecksum)
-        if not out:
-            print '\nInvalid OSPF checksum!\nIntf: ' + str(intf.intfId)
-    return out, destination
-
-
-def pack(format, list):
-    out = []
-    for i in range(1, len(format)):
-        aux = '!' + format[i]
-        out.append(struct.pack(aux, list[i - 1]))
-    return out
+    length = OSPF_HEADER.unpack_from(msg)[2]
+    destinations = [intf.address, ospf_group_address]
+    pseudoHeaders = [ipv6_pseudoheader(sender, destination, length)[0] for destination in destinations]
+    match = ospfChecksum.verify(msg, OSPF_CHECKSUM_OFFSET - IPV6_HEADER.size, pseudoHeaders, received)
+    if match < 0:
+        print '\nInvalid OSPF checksum!\nIntf: ' + str(intf.intfId)
+        return False, ospf_group_address
+    return True, destinations[match]
 
 
-def checksum_ospf(list):
-    packet = ''
-    i = 0
-    for packetPiece in list:
-        j = 0
-        for info in packetPiece:
-            if i == 1 and j == 5:
-                packet += struct.pack('!H', 0)
-            else:
-                packet += info
-            j += 1
-        i += 1
-    countTo = (int(len(packet) / 2)) * 2
-    my_sum = 0
-    count = 0
-
-    while count < countTo:
-        if sys.byteorder == "little":
-            loByte = packet[count]
-            hiByte = packet[count + 1]
-        else:
-            loByte = packet[count + 1]
-            hiByte = packet[count]
-        my_sum += (ord(hiByte) * 256 + ord(loByte))
-        count += 2
-
-    if countTo < len(packet):
-        loByte = packet[len(packet) - 1]
-        my_sum += ord(loByte)
-
-    my_sum &= 0xffffffff
-    my_sum = (my_sum >> 16) + (my_sum & 0xffff)
-    my_sum += (my_sum >> 16)
-    answer = ~my_sum & 0xffff
-    answer = socket.htons(answer)
-    return struct.pack("!H", answer)
+def checksum_ospf(pseudoHeader, packet):  # over the IPv6 datagram in packet, its OSPF checksum field must be zero
+    total = ospfChecksum.pieces_sum(pseudoHeader) + ospfChecksum.word_sum(packet, IPV6_HEADER.size)
+    return ospfChecksum.internet_checksum(total)
 
 
 def ip_converter(input):
@@ -1145,6 +946,13 @@ def ip_converter(input):
     return output
 
 
+def prefix_address(data, offset, length):  # length in bytes, the rest of the address is zero
+    address = data[offset:offset + length]
+    if isinstance(address, memoryview):  # inet_ntop only takes strings
+        address = address.tobytes()
+    return socket.inet_ntop(socket.AF_INET6, address + '\x00' * (16 - length))
+
+
 def unpack_ims(ims):
     ims = bin(ims)
     out = {}
@@ -1170,12 +978,12 @@ def load_size(packet):
     return size
 
 
-def packet_builder(list):
-    out = ''
-    for part in list:
-        for info in part:
-            out += info
-    return out
+def packet_builder(packet, offset, pieces):  # copies the pieces into packet from offset on, returns where they end
+    for piece in pieces:
+        end = offset + len(piece)
+        packet[offset:end] = piece
+        offset = end
+    return offset
 
 
 def build_lsa_options(dc, r, e, v6):
@@ -1183,27 +991,7 @@ def build_lsa_options(dc, r, e, v6):
 
 
 def fletcher_checksum(list):
-    CHKSUM_OFFSET = 16
-    packet = ''
-    for part in list:
-        for info in part:
-            packet += info
-
-    packet = packet[:CHKSUM_OFFSET] + '\x00\x00' + packet[CHKSUM_OFFSET + 2:]  # turns chksum to 0
-    c0 = c1 = 0
-    for char in packet[2:]:  # ignores LS Age
-        c0 += ord(char)
-        c1 += c0
-    c0 %= 255
-    c1 %= 255
-    x = ((len(packet) - 16 - 1) * c0 - c1) % 255
-    if x <= 0:
-        x += 255
-    y = 510 - c0 - x
-    if y > 255:
-        y -= 255
-    out = chr(x) + chr(y)
-    return out
+    return ospfChecksum.fletcher(''.join([info for part in list for info in part]))
 
 
 def buildWVEB(w, v, e, b):
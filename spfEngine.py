@@ -0,0 +1,396 @@
+from array import array
+import multiprocessing
+
+spf_pool = None  # multiprocessing.Pool running csr_spf, see set_workers
+
+
+class SPFHeap:
+    def __init__(self):
+        self.heap = []  # [[cost, rank, order, node],]
+        self.position = {}  # {node: index in heap}
+        self.order = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, node):
+        return node in self.position
+
+    def push(self, node, cost, rank=0):
+        entry = [cost, rank, self.order, node]
+        self.order += 1
+        self.heap.append(entry)
+        self.position[node] = len(self.heap) - 1
+        self.sift_up(len(self.heap) - 1)
+
+    def decrease_key(self, node, cost):
+        index = self.position[node]
+        entry = self.heap[index]
+        if cost < entry[0]:
+            entry[0] = cost
+            self.sift_up(index)
+
+    def push_or_decrease(self, node, cost, rank=0):
+        if node in self.position:
+            self.decrease_key(node, cost)
+        else:
+            self.push(node, cost, rank)
+
+    def pop(self):
+        heap = self.heap
+        last = heap.pop()
+        if heap:
+            entry = heap[0]
+            heap[0] = last
+            self.position[last[3]] = 0
+            self.sift_down(0)
+        else:
+            entry = last
+        del self.position[entry[3]]
+        return entry[3], entry[0]
+
+    def sift_up(self, index):
+        heap = self.heap
+        entry = heap[index]
+        while index > 0:
+            parentIndex = (index - 1) >> 1
+            parent = heap[parentIndex]
+            if entry[:3] < parent[:3]:
+                heap[index] = parent
+                self.position[parent[3]] = index
+                index = parentIndex
+            else:
+                break
+        heap[index] = entry
+        self.position[entry[3]] = index
+
+    def sift_down(self, index):
+        heap = self.heap
+        size = len(heap)
+        entry = heap[index]
+        child = 2 * index + 1
+        while child < size:
+            right = child + 1
+            if right < size and heap[right][:3] < heap[child][:3]:
+                child = right
+            if heap[child][:3] < entry[:3]:
+                heap[index] = heap[child]
+                self.position[heap[index][3]] = index
+                index = child
+                child = 2 * index + 1
+            else:
+                break
+        heap[index] = entry
+        self.position[entry[3]] = index
+
+
+def heap_dijkstra(graph, initial, nodeList, parentSets=None):
+    return graph.get_csr(nodeList).dijkstra(initial, parentSets)
+
+
+class CSRGraph:  # dense integer ids with array-backed adjacency rows, rebuilt when the topology changes
+    def __init__(self, graph, nodeList):
+        self.version = graph.version
+        self.nodes = []  # [node,] indexed by id
+        self.index = {}  # {node: id}
+        self.edgeIndex = {}  # {(SNode, DNode): position in targets}
+        self.isNetwork = array('b')  # [0|1,] indexed by id
+        self.offsets = array('l', [0])  # row of node i is targets[offsets[i]:offsets[i + 1]]
+        self.targets = array('l')
+        self.costs = array('l')
+
+        for node in list(graph.nodes):
+            self.node_id(node)
+        expanded = len(self.nodes)  # nodes only known through edges or prefixes keep an empty row
+        for node in self.nodes[:expanded]:
+            for edge in list(graph.edges.get(node, ())):
+                try:
+                    cost = graph.distances[(node, edge)]
+                except:
+                    continue
+                target = resolve_node(edge, nodeList)
+                if target is None:
+                    continue
+                self.edgeIndex[(node, edge)] = len(self.targets)
+                self.targets.append(self.node_id(target))
+                self.costs.append(cost)
+            self.offsets.append(len(self.targets))
+        self.offsets.extend([len(self.targets)] * (len(self.nodes) - expanded))
+
+    def node_id(self, node):
+        try:
+            return self.index[node]
+        except KeyError:
+            self.index[node] = len(self.nodes)
+            self.nodes.append(node)
+            self.isNetwork.append(1 if node.is_network() else 0)
+            return self.index[node]
+
+    def patch_cost(self, from_node, to_node, cost):
+        try:
+            self.costs[self.edgeIndex[(from_node, to_node)]] = cost
+            return True
+        except KeyError:
+            return False
+
+    def snapshot(self):  # compact picklable form handed to the worker pool
+        return self.offsets, self.targets, self.costs, self.isNetwork
+
+    def dijkstra(self, initial, parentSets=None):  # parentSets, when given, is filled with every equal-cost parent
+        start = self.index.get(initial)
+        if start is None:
+            return {initial: 0}, {}, {}
+        result = pool_spf([self.snapshot() + (start,)])[0]
+        return self.convert(result, parentSets)
+
+    def distances_from(self, roots):  # {root: {node: cost}}, fanned out over the pool when there is one
+        roots = [root for root in roots if root in self.index]
+        results = pool_spf([self.snapshot() + (self.index[root],) for root in roots])
+        out = {}
+        for root, result in zip(roots, results):
+            out[root] = self.convert(result, None)[0]
+        return out
+
+    def convert(self, result, parentSets):
+        distance, parents, hops = result
+        visited = {}
+        path = {}
+        nextHops = {}
+        nodes = self.nodes
+        for i in xrange(len(nodes)):
+            if distance[i] is not None:
+                node = nodes[i]
+                visited[node] = distance[i]
+                if parents[i] is not None:
+                    path[node] = nodes[parents[i][0]]
+                    nextHops[node] = [nodes[hop] for hop in hops[i]]
+                    if parentSets is not None:
+                        parentSets[node] = [nodes[parent] for parent in parents[i]]
+        return visited, path, nextHops
+
+
+def csr_spf(offsets, targets, costs, isNetwork, start):  # runs in the SPF thread or in a pool worker
+    size = len(offsets) - 1
+    distance = [None] * size
+    parents = [None] * size  # [[equal-cost parent ids],] the first one is the tree parent
+    hops = [None] * size  # [[next hop ids],]
+    done = [False] * size
+
+    distance[start] = 0
+    heap = SPFHeap()
+    heap.push(start, 0)
+    while heap:
+        min_node, current_weight = heap.pop()
+        done[min_node] = True
+        attached = min_node != start and isNetwork[min_node] and start in parents[min_node]
+        for position in xrange(offsets[min_node], offsets[min_node + 1]):
+            edge = targets[position]
+            if done[edge]:
+                continue
+            weight = current_weight + costs[position]
+            if min_node == start:
+                inherited = [edge]
+            elif attached:  # routers behind an attached network are their own next hop (RFC 2328 16.1.1)
+                inherited = [edge if hop == min_node else hop for hop in hops[min_node]]
+            else:
+                inherited = hops[min_node]
+            if distance[edge] is None or weight < distance[edge]:
+                distance[edge] = weight
+                parents[edge] = [min_node]
+                hops[edge] = inherited
+                heap.push_or_decrease(edge, weight, 1 - isNetwork[edge])
+            elif weight == distance[edge] and min_node not in parents[edge]:
+                parents[edge].append(min_node)
+                hops[edge] = hops[edge] + [hop for hop in inherited if hop not in hops[edge]]
+    return distance, parents, hops
+
+
+def csr_spf_args(args):
+    return csr_spf(*args)
+
+
+def pool_spf(args):  # [csr_spf result,] per argument tuple, in the calling thread when the pool is gone or fails
+    pool = spf_pool
+    if pool is not None:
+        try:
+            return pool.map(csr_spf_args, args)
+        except Exception:  # closed while set_workers replaced it, or a worker died
+            pass
+    return [csr_spf_args(arg) for arg in args]
+
+
+def set_workers(workers):  # 0 runs SPF in the calling thread
+    global spf_pool
+    old = spf_pool
+    spf_pool = multiprocessing.Pool(workers) if workers > 0 else None  # new runs go to the new pool right away
+    if old is not None:
+        old.close()  # calls already handed to the old pool still finish
+        old.join()
+
+
+def resolve_node(node, nodeList):
+    if type(node) is str:
+        return nodeList.get(node)
+    return node
+
+
+def inherit_next_hops(node, parent, initial, parentSets, nextHops):  # RFC 2328 16.1.1
+    if parent is initial:
+        return [node]
+    if parent.is_network() and initial in parentSets[parent]:  # routers behind an attached network are reached directly
+        return [node if hop is parent else hop for hop in nextHops[parent]]
+    return nextHops[parent]
+
+
+def spf_order(visited):  # equal-cost networks settle before the routers they reach over zero-cost edges
+    return lambda node: (visited[node], not node.is_network())
+
+
+def incoming_edges(graph, node):  # edges are keyed by node object (overlay) or by node id (local areas)
+    out = []
+    for key in (node, node.idx):
+        for fromNode in graph.inEdges.get(key, ()):
+            try:
+                out.append((fromNode, graph.distances[(fromNode, key)]))
+            except:
+                continue
+    return out
+
+
+def edge_cost(graph, fromNode, node):
+    costs = [graph.distances.get((fromNode, key)) for key in (node, node.idx)]  # the edge may go away meanwhile
+    costs = [cost for cost in costs if cost is not None]
+    if costs:
+        return min(costs)
+    return None
+
+
+class IncrementalSPF:
+    def __init__(self):
+        self.ready = False
+        self.visited = {}  # {node: cost}
+        self.path = {}  # {node: parent}
+        self.parents = {}  # {node: [parent1, parent2]} every equal-cost parent, path holds the first one
+        self.nextHops = {}  # {node: [nextHop1, nextHop2]}
+        self.initial = None
+        self.children = {}  # {node: set(child1, child2)}
+
+    def full(self, graph, initial, nodeList):
+        self.parents = {}
+        self.visited, self.path, self.nextHops = heap_dijkstra(graph, initial, nodeList, self.parents)
+        self.initial = initial
+        self.children = {}
+        for node, parents in self.parents.items():
+            for parent in parents:
+                self.children.setdefault(parent, set()).add(node)
+        self.ready = True
+        return self.visited, self.path, self.nextHops
+
+    def add_parent(self, node, parent):
+        self.parents.setdefault(node, []).append(parent)
+        self.path.setdefault(node, parent)
+        self.children.setdefault(parent, set()).add(node)
+
+    def clear_parents(self, node):
+        for parent in self.parents.pop(node, ()):
+            self.children[parent].discard(node)
+        self.path.pop(node, None)
+
+    def remove_parent(self, node, parent):  # returns True once the node has no equal-cost parent left
+        parents = self.parents[node]
+        parents.remove(parent)
+        self.children[parent].discard(node)
+        if parents:
+            self.path[node] = parents[0]
+            return False
+        del self.parents[node]
+        del self.path[node]
+        return True
+
+    def invalidate_subtree(self, root, invalid, dirty):
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node in invalid:
+                continue
+            invalid.add(node)
+            del self.visited[node]
+            del self.nextHops[node]
+            for child in list(self.children.get(node, ())):
+                if self.remove_parent(child, node):
+                    stack.append(child)
+                else:
+                    dirty.add(child)
+            self.children.pop(node, None)
+
+    def relax(self, heap, node, parent, weight, dirty):
+        if node not in self.visited or weight < self.visited[node]:
+            self.visited[node] = weight
+            self.clear_parents(node)
+            self.add_parent(node, parent)
+            dirty.add(node)
+            heap.push_or_decrease(node, weight)
+        elif weight == self.visited[node] and parent not in self.parents[node]:
+            self.add_parent(node, parent)
+            dirty.add(node)
+
+    def update_next_hops(self, dirty):  # next hops of changed nodes and everything below them
+        affected = set()
+        stack = list(dirty)
+        while stack:
+            node = stack.pop()
+            if node in affected or node not in self.visited:
+                continue
+            affected.add(node)
+            stack.extend(self.children.get(node, ()))
+        for node in sorted(affected, key=spf_order(self.visited)):
+            hops = []
+            for parent in self.parents[node]:
+                for hop in inherit_next_hops(node, parent, self.initial, self.parents, self.nextHops):
+                    if hop not in hops:
+                        hops.append(hop)
+            self.nextHops[node] = hops
+
+    def repair(self, graph, initial, nodeList, deltas):
+        visited = self.visited
+        invalid = set()
+        dirty = set()
+        for fromNode, toNode, oldCost, newCost in deltas:  # changed shortest-path edges drop that parent
+            toNode = resolve_node(toNode, nodeList)
+            if toNode is None or toNode in invalid or fromNode not in self.parents.get(toNode, ()):
+                continue
+            if self.remove_parent(toNode, fromNode):
+                self.invalidate_subtree(toNode, invalid, dirty)
+            else:
+                dirty.add(toNode)
+
+        heap = SPFHeap()
+        for node in invalid:  # reattach invalidated nodes through their untouched neighbours
+            for fromNode, cost in incoming_edges(graph, node):
+                if fromNode in visited and fromNode not in invalid and fromNode in graph.nodes:
+                    self.relax(heap, node, fromNode, visited[fromNode] + cost, dirty)
+        for fromNode, toNode, oldCost, newCost in deltas:  # new or cheaper edges may shorten paths
+            if fromNode not in visited or fromNode not in graph.nodes:
+                continue
+            node = resolve_node(toNode, nodeList)
+            if node is None or node is initial:
+                continue
+            cost = edge_cost(graph, fromNode, node)
+            if cost is not None:
+                self.relax(heap, node, fromNode, visited[fromNode] + cost, dirty)
+
+        while heap:
+            min_node, current_weight = heap.pop()
+            if min_node not in graph.nodes:
+                continue
+            for edge in graph.edges.get(min_node, ()):
+                try:
+                    weight = current_weight + graph.distances[(min_node, edge)]
+                except:
+                    continue
+                edge = resolve_node(edge, nodeList)
+                if edge is None or edge is initial:
+                    continue
+                self.relax(heap, edge, min_node, weight, dirty)
+        self.update_next_hops(dirty)
+        return visited, self.path, self.nextHops
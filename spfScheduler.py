@@ -0,0 +1,81 @@
+import threading
+import time
+
+SPF_INITIAL_DELAY = 0.05  # seconds between the first change and the SPF run
+SPF_HOLD_TIME = 0.2  # minimum interval between two consecutive runs, doubled while changes keep coming
+SPF_MAX_WAIT = 5.0  # upper bound for the hold time; a quiet period this long resets the back-off
+
+
+class SPFScheduler:
+    def __init__(self, initialDelay=SPF_INITIAL_DELAY, holdTime=SPF_HOLD_TIME, maxWait=SPF_MAX_WAIT):
+        self.initialDelay = initialDelay
+        self.holdTime = holdTime
+        self.maxWait = maxWait
+        self.currentHold = holdTime
+        self.condition = threading.Condition()
+        self.work = True
+        self.pending = False
+        self.firstEvent = None  # time of the first change waiting for a run
+        self.lastRun = None
+        self.scheduled = 0  # changes that armed a new run
+        self.coalesced = 0  # changes folded into a run that was already pending
+        self.executed = 0  # runs actually started
+
+    def schedule(self):
+        self.condition.acquire()
+        try:
+            now = time.time()
+            if self.pending:
+                self.coalesced += 1
+            else:
+                if self.lastRun is None or now - self.lastRun >= self.maxWait:  # quiet network, back to fast runs
+                    self.currentHold = self.holdTime
+                self.pending = True
+                self.firstEvent = now
+                self.scheduled += 1
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def next_run_time(self):
+        due = self.firstEvent + self.initialDelay
+        if self.lastRun is not None:
+            due = max(due, self.lastRun + self.currentHold)
+        return due
+
+    def wait(self):  # blocks until a run is due, returns False once the scheduler is stopped
+        self.condition.acquire()
+        try:
+            while self.work:
+                if not self.pending:
+                    self.condition.wait()
+                    continue
+                now = time.time()
+                due = self.next_run_time()
+                if now < due:
+                    self.condition.wait(due - now)
+                    continue
+                self.pending = False
+                self.firstEvent = None
+                if self.lastRun is not None and now - self.lastRun < self.maxWait:
+                    self.currentHold = min(self.currentHold * 2, self.maxWait)
+                self.lastRun = now
+                self.executed += 1
+                return True
+            return False
+        finally:
+            self.condition.release()
+
+    def stop(self):
+        self.condition.acquire()
+        try:
+            self.work = False
+            self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+    def print_statistics(self, name):
+        print name + ':'
+        print '\tscheduled: ' + str(self.scheduled) + ' coalesced: ' + str(self.coalesced) + \
+              ' executed: ' + str(self.executed)
+        print '\tcurrent hold time: ' + str(self.currentHold) + 's'
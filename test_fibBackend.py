@@ -0,0 +1,135 @@
+import unittest
+import addressManagment
+import dijkstraManager
+import errno
+import fibBackend
+import fibMirror
+import fibWriter
+
+PREFIX = '2001:db8:1::/64'
+
+
+class FakeBatch:  # stands in for the ip -batch process, keeps the lines it was sent
+    sent = []
+
+    def __init__(self, arguments, stdin=None, stdout=None, stderr=None):
+        self.arguments = arguments
+
+    def communicate(self, data):
+        FakeBatch.sent.extend(data.splitlines())
+        return '', None
+
+
+class BrokenBackend:  # raises on its first commit, then behaves like the memory backend
+    name = 'broken'
+
+    def __init__(self):
+        self.raised = False
+
+    def available(self):
+        return True
+
+    def commit(self, operations, fib):
+        if not self.raised:
+            self.raised = True
+            raise OSError(errno.EPIPE, 'backend went away')
+        return fibBackend.backends['memory'].commit(operations, fib)
+
+
+class ShellBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.popen = fibBackend.subprocess.Popen
+        fibBackend.subprocess.Popen = FakeBatch
+        FakeBatch.sent = []
+        self.fib = fibMirror.FIBMirror()
+        self.fib.set(PREFIX, [dijkstraManager.Adjacency('eth0', 'fe80::a')], 20, False)
+
+    def tearDown(self):
+        fibBackend.subprocess.Popen = self.popen
+
+    def commit(self, linkLocal, metric):
+        operation = addressManagment.FIBOperation(PREFIX, PREFIX, [dijkstraManager.Adjacency('eth1', linkLocal)],
+                                                  metric, False)
+        return fibBackend.ShellBackend().commit([operation], self.fib)
+
+    def test_same_metric_next_hop_change_is_replaced(self):
+        self.assertEqual(self.commit('fe80::b', 20), [0])
+        self.assertEqual(FakeBatch.sent, ['route replace ' + PREFIX + ' via fe80::b dev eth1 metric 20' +
+                                          fibBackend.route_tag()])
+
+    def test_metric_change_deletes_the_old_route(self):
+        self.assertEqual(self.commit('fe80::b', 30), [0])
+        self.assertEqual(FakeBatch.sent, ['route del ' + PREFIX + ' metric 20' + fibBackend.route_tag(),
+                                          'route replace ' + PREFIX + ' via fe80::b dev eth1 metric 30' +
+                                          fibBackend.route_tag()])
+
+
+class FIBTransactionTest(unittest.TestCase):  # mirror bookkeeping when the kernel refuses an install
+    def setUp(self):
+        self.backend = fibBackend.backend
+        self.fib = addressManagment.fib
+        fibBackend.set_backend('memory')
+        fibBackend.backends['memory'].flush()
+        addressManagment.fib = fibMirror.FIBMirror()
+        transaction = addressManagment.FIBTransaction()
+        transaction.add_route(PREFIX, PREFIX, [dijkstraManager.Adjacency('eth0', 'fe80::a')], 20, False)
+        transaction.commit()
+
+    def tearDown(self):
+        fibBackend.set_backend(self.backend)
+        addressManagment.fib = self.fib
+
+    def refused(self, metric):  # the memory kernel refuses a route without next hops
+        transaction = addressManagment.FIBTransaction()
+        transaction.add_route(PREFIX, PREFIX, [], metric, False)
+        return transaction.commit()[PREFIX]
+
+    def test_refused_replace_keeps_the_old_route(self):
+        self.assertNotEqual(self.refused(20), 0)
+        self.assertEqual(addressManagment.fib.get(PREFIX).metric, 20)
+        self.assertIn(fibMirror.normalize(PREFIX), fibBackend.backends['memory'].dump())
+
+    def test_refused_metric_change_forgets_the_deleted_route(self):
+        self.assertNotEqual(self.refused(30), 0)
+        self.assertIsNone(addressManagment.fib.get(PREFIX))
+        self.assertNotIn(fibMirror.normalize(PREFIX), fibBackend.backends['memory'].dump())
+
+
+class FIBWriterTest(unittest.TestCase):  # a batch that raises must not stop the writer thread
+    def setUp(self):
+        self.backend = fibBackend.backend
+        self.fib = addressManagment.fib
+        fibBackend.backends['broken'] = BrokenBackend()
+        fibBackend.set_backend('broken')
+        fibBackend.backends['memory'].flush()
+        addressManagment.fib = fibMirror.FIBMirror()
+        self.writer = fibWriter.FIBWriter()
+        self.reported = {}
+
+    def tearDown(self):
+        self.writer.stop()
+        fibBackend.set_backend(self.backend)
+        del fibBackend.backends['broken']
+        addressManagment.fib = self.fib
+
+    def report(self, key, result):
+        self.reported[key] = result
+
+    def submit(self, prefix):
+        transaction = addressManagment.FIBTransaction(self.report)
+        transaction.add_route(prefix, prefix, [dijkstraManager.Adjacency('eth0', 'fe80::a')], 20, False)
+        self.writer.submit(transaction)
+        self.assertTrue(self.writer.flush(5.0))
+
+    def test_failed_batch_is_counted_and_later_ones_are_written(self):
+        self.submit(PREFIX)
+        self.assertEqual(self.writer.failed, 1)
+        self.assertEqual(self.reported[PREFIX], errno.EIO)
+        self.submit('2001:db8:2::/64')
+        self.assertTrue(self.writer.thread.is_alive())
+        self.assertEqual(self.reported['2001:db8:2::/64'], 0)
+        self.assertIn(fibMirror.normalize('2001:db8:2::/64'), fibBackend.backends['memory'].dump())
+
+
+if __name__ == '__main__':
+    unittest.main()
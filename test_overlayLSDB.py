@@ -0,0 +1,25 @@
+import unittest
+import overlayLSDB
+
+
+class ABRLSAEncodingTest(unittest.TestCase):  # reads must not invalidate the cached encoding
+    def setUp(self):
+        self.lsa = overlayLSDB.ABRLSA('1.1.1.1', 0, 0x80000001, '0.0.0.0', {'2.2.2.2': 10})
+        self.lsa.encoded_lsa(True)
+        self.cached = self.lsa.encoded
+
+    def test_read_reuses_the_cached_encoding(self):
+        self.assertEqual(self.lsa.get_neighbor_cost('2.2.2.2'), 10)
+        self.lsa.get_neighbor_list()
+        self.lsa.encoded_lsa(True)
+        self.assertIs(self.lsa.encoded, self.cached)
+
+    def test_change_rebuilds_the_encoding(self):
+        self.lsa.update_neighbor_cost('2.2.2.2', 20)
+        self.lsa.encoded_lsa(True)
+        self.assertIsNot(self.lsa.encoded, self.cached)
+        self.assertNotEqual(self.lsa.encoded[1], self.cached[1])
+
+
+if __name__ == '__main__':
+    unittest.main()